@@ -4,40 +4,38 @@ import pandas as pd
 import numpy as nb
 import matplotlib.pyplot as plt
 import seaborn as sns
-# test 
+import sys
+from pathlib import Path
 
-# uber data transformation
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import loaders
+from common.trip_features import add_calendar_features
 
-df=pd.read_csv('Vizualisation\Dashboard\uber.csv', delimiter=",") 
-df['Date/Time'] = pd.to_datetime(df['Date/Time'], format='%m/%d/%Y %H:%M:%S')
+# Files sit next to this script, wherever it is started from
+HERE = Path(__file__).resolve().parent
 
-def get_dom(dt):
-    return dt.day
+# uber data transformation (cached until uber.csv changes)
 
-df["day"]=df["Date/Time"].map(get_dom)
+@st.cache_data(ttl=loaders.CACHE_TTL, max_entries=loaders.MAX_ENTRIES)
+def load_uber_data(path, key):
+    df=pd.read_csv(path, delimiter=",") 
+    df['Date/Time'] = pd.to_datetime(df['Date/Time'], format='%m/%d/%Y %H:%M:%S')
 
-def get_weekday(dt):
-    return dt.weekday()
+    # day / weekday / hour (and month) in a single vectorized pass
+    return add_calendar_features(df)
 
-df["weekday"]=df["Date/Time"].map(get_weekday) 
-
-def get_hour(dt):
-    return dt.hour 
-
-df["hour"]=df["Date/Time"].map(get_hour)
+df = load_uber_data(str(HERE / 'uber.csv'), loaders.file_key(HERE / 'uber.csv'))
 
 # sidebar
     ## logo
-from PIL import Image
-
-uber_logo = Image.open('Vizualisation\Dashboard\Uber.png')
+uber_logo = loaders.load_image(HERE / 'Uber.png')
 sidebar = st.image(uber_logo)
 
 st.sidebar.title(
     "BIENVENU Samuel"
     )
 
-my_pic = Image.open('Vizualisation\Dashboard\CV.jpg')
+my_pic = loaders.load_image(HERE / 'CV.jpg')
 with st.sidebar:
     st.image(my_pic, caption= "Engineering Student")
 
@@ -4,40 +4,35 @@ import pandas as pd
 import numpy as nb
 import matplotlib.pyplot as plt
 import seaborn as sns
-# test 
+import sys
+from pathlib import Path
 
-# uber data transformation
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import loaders
+from common.trip_features import add_calendar_features
 
-df=pd.read_csv('uber.csv', delimiter=",") 
-df['Date/Time'] = pd.to_datetime(df['Date/Time'], format='%m/%d/%Y %H:%M:%S')
+# uber data transformation (cached until uber.csv changes)
 
-def get_dom(dt):
-    return dt.day
+@st.cache_data(ttl=loaders.CACHE_TTL, max_entries=loaders.MAX_ENTRIES)
+def load_uber_data(path, key):
+    df=pd.read_csv(path, delimiter=",") 
+    df['Date/Time'] = pd.to_datetime(df['Date/Time'], format='%m/%d/%Y %H:%M:%S')
 
-df["day"]=df["Date/Time"].map(get_dom)
+    # day / weekday / hour (and month) in a single vectorized pass
+    return add_calendar_features(df)
 
-def get_weekday(dt):
-    return dt.weekday()
-
-df["weekday"]=df["Date/Time"].map(get_weekday) 
-
-def get_hour(dt):
-    return dt.hour 
-
-df["hour"]=df["Date/Time"].map(get_hour)
+df = load_uber_data('uber.csv', loaders.file_key('uber.csv'))
 
 # sidebar
     ## logo
-from PIL import Image
-
-uber_logo = Image.open('Uber.png')
+uber_logo = loaders.load_image('Uber.png')
 sidebar = st.image(uber_logo)
 
 st.sidebar.title(
     "BIENVENU Samuel"
     )
 
-my_pic = Image.open('CV.jpg')
+my_pic = loaders.load_image('CV.jpg')
 with st.sidebar:
     st.image(my_pic, caption= "Engineering Student")
 
@@ -1,34 +1,130 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import pydeck as pdk
-import geopandas as gpd
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import loaders
+from common.energy_cube import EnergyCube, add_ratios
+from common.energy_store import DEFAULT_STORE, ingest_energy, rollup_energy, store_version
+from common.regions import load_regions, region_centroids
+
+FICHIER_CONSO = "consommation-annuelle-d-electricite-et-gaz-par-region.csv"
+
+# Fichiers facultatifs à la maille commune ou IRIS (100 à 1000 fois plus gros), lus hors
+# mémoire depuis un stockage Parquet (.cache/energie/<maille>) et agrégés à la demande.
+# Les IRIS redécoupent la consommation des communes : chaque maille a son propre
+# stockage et une seule est lue à la fois, sans quoi tout serait compté deux fois
+FICHIERS_DETAIL = {
+    "Communes": sorted(Path(".").glob("consommation-annuelle-d-electricite-et-gaz-par-commune*.csv")),
+    "IRIS": sorted(Path(".").glob("consommation-annuelle-d-electricite-et-gaz-par-iris*.csv")),
+}
+FICHIERS_DETAIL = {maille: fichiers for maille, fichiers in FICHIERS_DETAIL.items() if fichiers}
+GRANULARITES = ["Régions"] + list(FICHIERS_DETAIL)
+
+# Mesures additionnées dans conso_totale ; les fichiers communes au format conso/pdl
+# n'ont que conso_totale_mwh
+MESURES_TOTALE = [
+    "conso_totale_mwh",
+    "conso_totale_a_usages_thermosensibles_mwh",
+    "conso_totale_a_usages_non_thermosensibles_mwh",
+]
+
+def stockage(granularite):
+    return DEFAULT_STORE / granularite.lower()
 
 # 1. Préparation des données
 
-# Charger le dataset
-df = pd.read_csv("consommation-annuelle-d-electricite-et-gaz-par-region.csv", sep=";")
-
-# Remplacer les valeurs manquantes par 0
-df.fillna(0, inplace=True)
-
-# Convertir 'part_thermosensible' en pourcentage
-df['part_thermosensible'] = df['part_thermosensible'] * 100
-
-# Calculer la consommation totale d'énergie (électricité + gaz) 
-df["conso_totale"] = df["conso_totale_mwh"] + df["conso_totale_a_usages_thermosensibles_mwh"] + df["conso_totale_a_usages_non_thermosensibles_mwh"]
-
-# Calculer la consommation par habitant pour l'ensemble du dataset
-df["conso_par_habitant"] = df["conso_totale"] / df["nombre_d_habitants"]
-
-# Charger le GeoJSON des régions françaises et extraire les coordonnées
-regions_geojson = gpd.read_file("https://france-geojson.gregoiredavid.fr/repo/regions.geojson")
-regions_geojson["code"] = regions_geojson["code"].astype(int)  
-regions_geojson["longitude"] = regions_geojson["geometry"].centroid.x
-regions_geojson["latitude"] = regions_geojson["geometry"].centroid.y
-
-# Fusionner les coordonnées avec le DataFrame principal
-df = df.merge(regions_geojson[["code", "longitude", "latitude"]], left_on="code_region", right_on="code")
+# GeoJSON des régions : copie locale (regions.geojson), simplifiée et mise en cache
+# dans .cache/ avec les centroïdes précalculés. Rien n'est téléchargé : sans copie
+# locale, les cartes placent les régions à leurs centroïdes (REGION_CENTROIDS)
+@st.cache_resource(ttl=loaders.CACHE_TTL)
+def charger_regions():
+    return load_regions()
+
+regions_geojson = charger_regions()
+
+def carte_regions(df, couleur, **options):
+    # Choroplèthe si le GeoJSON est disponible, sinon une bulle par région
+    if regions_geojson is None:
+        st.caption(
+            "Contours des régions indisponibles (regions.geojson absent) : une bulle par région. "
+            "Pour les choroplèthes : `python -m common.regions --output Elec/regions.geojson`."
+        )
+        fig = px.scatter_geo(df, lat="latitude", lon="longitude", color=couleur, **options)
+        fig.update_traces(marker_size=18)
+        fig.update_geos(fitbounds="locations")
+    else:
+        fig = px.choropleth(
+            df, geojson=regions_geojson, locations="code_region", featureidkey="properties.code", color=couleur, **options
+        )
+        fig.update_geos(fitbounds="locations", visible=False)
+    return fig
+
+def ajouter_conso_totale(df):
+    # Consommation totale d'énergie (électricité + gaz), à partir des mesures présentes
+    df["conso_totale"] = df[[c for c in MESURES_TOTALE if c in df]].sum(axis=1)
+    return df
+
+def completer(df):
+    # Remplacer les valeurs manquantes par 0
+    df.fillna(0, inplace=True)
+
+    # Calculer la consommation totale d'énergie (électricité + gaz) 
+    ajouter_conso_totale(df)
+
+    # Les ratios (par habitant, part thermosensible...) sont calculés après agrégation
+    # par add_ratios : une somme de ratios ligne à ligne n'a pas de sens
+
+    # Fusionner les centroïdes des régions avec le DataFrame principal
+    return df.merge(region_centroids(regions_geojson), left_on="code_region", right_on="code")
+
+# Mise en cache : la préparation n'est refaite que si le CSV change (mtime dans la clé)
+@st.cache_data(ttl=loaders.CACHE_TTL, max_entries=loaders.MAX_ENTRIES)
+def preparer_donnees(chemin, cle):
+    return completer(pd.read_csv(chemin, sep=";"))
+
+# Fichiers détaillés : un seul parcours par lots du stockage, ramené à la maille régionale
+@st.cache_data(ttl=loaders.CACHE_TTL, max_entries=loaders.MAX_ENTRIES)
+def preparer_detail(granularite, version):
+    return completer(rollup_energy(stockage(granularite), level="region"))
+
+# Drilldown départemental : les filtres sont appliqués pendant la lecture du Parquet
+@st.cache_data(ttl=loaders.CACHE_TTL, max_entries=loaders.MAX_ENTRIES)
+def detail_departements(granularite, version, annee, filiere, secteur, region):
+    dep_df = rollup_energy(
+        stockage(granularite), level="departement", annee=annee, filiere=filiere, code_grand_secteur=secteur, nom_region=region
+    )
+    return ajouter_conso_totale(dep_df.fillna(0))
+
+# Cube pré-agrégé (année x filière x région x secteur x opérateur) : chaque section
+# en extrait une tranche au lieu de refiltrer le CSV complet
+@st.cache_resource(ttl=loaders.CACHE_TTL)
+def construire_cube(granularite, cle):
+    if granularite in FICHIERS_DETAIL:
+        return EnergyCube.from_frame(preparer_detail(granularite, cle))
+    return EnergyCube.from_frame(preparer_donnees(FICHIER_CONSO, cle))
+
+# Les sections qui demandent des colonnes absentes des fichiers détaillés (part
+# thermosensible, DJU, logement, habitants) s'expliquent au lieu d'échouer
+COLONNES_THERMO = [
+    "conso_totale_a_usages_thermosensibles_mwh",
+    "conso_totale_a_usages_non_thermosensibles_mwh",
+    "thermosensibilite_totale_kwh_dju",
+    "dju_a_tr",
+]
+COLONNES_LOGEMENT = ["taux_de_logements_collectifs", "taux_de_chauffage_electrique", "taux_de_residences_principales"]
+
+def colonnes_manquantes(cube, colonnes):
+    manquantes = [c for c in colonnes if c not in cube.table]
+    if manquantes:
+        st.info("Section indisponible pour ces fichiers, colonnes absentes : " + ", ".join(manquantes))
+    return manquantes
+
+photo = loaders.load_image("CV.jpg")
 
 # 2. Interface utilisateur de Streamlit
 
@@ -46,7 +142,7 @@ st.markdown(
 )
 
 # Votre photo
-st.sidebar.image("CV.jpg", use_column_width=True)
+st.sidebar.image(photo, use_column_width=True)
 
 # Vos informations personnelles
 st.sidebar.markdown("**Prénom NOM**")
@@ -54,6 +150,24 @@ st.sidebar.markdown("**Email :** votre_email@example.com")
 st.sidebar.markdown("**LinkedIn :**  linkedin.com/in/votre_profil")
 st.sidebar.markdown("---")
 
+# Vider les caches pour relire immédiatement les fichiers modifiés
+if st.sidebar.button("Recharger les données 🔄"):
+    loaders.clear_caches()
+    st.rerun()
+
+# Maille des données (proposée seulement si des fichiers communes / IRIS sont présents)
+granularite = GRANULARITES[0]
+if FICHIERS_DETAIL:
+    granularite = st.sidebar.radio("Granularité des données", GRANULARITES)
+
+if granularite in FICHIERS_DETAIL:
+    with st.spinner("Mise à jour du stockage Parquet..."):
+        ingest_energy(FICHIERS_DETAIL[granularite], stockage(granularite))
+    cle = store_version(stockage(granularite))
+else:
+    cle = loaders.file_key(FICHIER_CONSO)
+cube = construire_cube(granularite, cle)
+
 # Créer les pages du dashboard
 pages = ["Présentation", "Dashboard"]
 page_selected = st.sidebar.radio("Navigation", pages)
@@ -106,29 +220,31 @@ if page_selected == "Présentation":
 
     # Image dans la deuxième colonne
     with col2:
-        st.image("CV.jpg", use_column_width=True) 
+        st.image(photo, use_column_width=True) 
 
 elif page_selected == "Dashboard":
 
     # Titre du dashboard
     st.title("Consommation d'énergie en France: Électricité et Gaz (2011-2022)")
 
-    # Sidebar globale pour les filtres
+    # Sidebar globale pour les filtres. Pas de fragments par section : ils ne peuvent pas
+    # placer de widget dans la sidebar, et le cube mis en cache rend la réexécution
+    # complète peu coûteuse (des tranches de quelques milliers de lignes)
 
     # Année (filtre commun à toutes les sections)
-    annee_selected = st.sidebar.selectbox("Sélectionnez l'année", df["annee"].unique())
+    annee_selected = st.sidebar.selectbox("Sélectionnez l'année", cube.values("annee"))
 
     # Filière (filtre commun à la vue d'ensemble, la thermosensibilité et la carte 3D)
-    filiere_selected = st.sidebar.selectbox("Sélectionnez la filière énergétique", df["filiere"].unique())
+    filiere_selected = st.sidebar.selectbox("Sélectionnez la filière énergétique", cube.values("filiere"))
 
     # Opérateur (filtre pour la vue d'ensemble)
-    operateur_selected = st.sidebar.multiselect("Sélectionnez l'opérateur", df["operateur"].unique())
+    operateur_selected = st.sidebar.multiselect("Sélectionnez l'opérateur", cube.values("operateur"))
 
     # Région (filtre pour l'analyse temporelle et les caractéristiques du logement)
-    region_selected = st.sidebar.selectbox("Sélectionnez la région", df["nom_region"].unique())
+    region_selected = st.sidebar.selectbox("Sélectionnez la région", cube.values("nom_region"))
 
     # Secteur d'activité (filtre pour l'analyse temporelle et la carte 3D)
-    secteur_selected = st.sidebar.selectbox("Sélectionnez le secteur d'activité", df["code_grand_secteur"].unique())
+    secteur_selected = st.sidebar.selectbox("Sélectionnez le secteur d'activité", cube.values("code_grand_secteur"))
 
     # 3. Visualisations et analyses
 
@@ -136,32 +252,27 @@ elif page_selected == "Dashboard":
 
     st.header("Vue d'ensemble")
 
-    # Filtrer le DataFrame en fonction des selections de la sidebar
-    filtered_df = df[(df["annee"] == annee_selected) & (df["filiere"] == filiere_selected)]
-    if operateur_selected:
-        filtered_df = filtered_df[filtered_df["operateur"].isin(operateur_selected)]
+    # Tranche du cube correspondant aux sélections de la sidebar
+    tranche = cube.slice(annee=annee_selected, filiere=filiere_selected, operateur=operateur_selected)
 
     # Carte choroplèthe
     st.subheader("Consommation totale d'énergie par région")
-    fig = px.choropleth(
+    filtered_df = add_ratios(tranche.rollup(["code_region", "nom_region"]), ["conso_moyenne_mwh"])
+    fig = carte_regions(
         filtered_df,
-        geojson="https://france-geojson.gregoiredavid.fr/repo/regions.geojson",
-        locations="code_region",
-        featureidkey="properties.code",
-        color="conso_totale",
+        "conso_totale",
         color_continuous_scale="Viridis",
         hover_name="nom_region",
         hover_data={"conso_totale": True, "conso_moyenne_mwh": True},
         title="Consommation d'énergie par région",
         labels={"conso_totale": "Consommation totale (MWh)"}
     )
-    fig.update_geos(fitbounds="locations", visible=False)
     st.plotly_chart(fig)
 
     # Graphique en barres empilées
     st.subheader("Répartition de la consommation par secteur d'activité")
     fig = px.bar(
-        filtered_df,
+        tranche.rollup(["code_grand_secteur"]),
         x="code_grand_secteur",
         y="conso_totale",
         color="code_grand_secteur",
@@ -173,7 +284,7 @@ elif page_selected == "Dashboard":
     # 3.2 Analyse temporelle (filtrage par région et secteur)
 
     st.header("Analyse temporelle")
-    filtered_df = df[(df["nom_region"] == region_selected) & (df["code_grand_secteur"] == secteur_selected)]
+    filtered_df = cube.slice(nom_region=region_selected, code_grand_secteur=secteur_selected).rollup(["annee", "filiere"])
 
     # Graphique en courbes
     st.subheader("Évolution de la consommation d'énergie au fil des années")
@@ -203,91 +314,91 @@ elif page_selected == "Dashboard":
     # 3.3 Thermosensibilité (filtrage par année et filière)
 
     st.header("Thermosensibilité")
-    filtered_df = df[(df["annee"] == annee_selected) & (df["filiere"] == filiere_selected)]
+    if not colonnes_manquantes(cube, COLONNES_THERMO):
+        filtered_df = cube.slice(annee=annee_selected, filiere=filiere_selected).rollup(["code_region", "nom_region"])
+        filtered_df = add_ratios(filtered_df, ["part_thermosensible"])
 
-    # Carte choroplèthe
-    st.subheader("Part de la consommation thermosensible par région")
-    fig = px.choropleth(
-        filtered_df,
-        geojson="https://france-geojson.gregoiredavid.fr/repo/regions.geojson",
-        locations="code_region",
-        featureidkey="properties.code",
-        color="part_thermosensible",
-        color_continuous_scale="RdBu_r",
-        hover_name="nom_region",
-        hover_data={
-            "part_thermosensible": True,
-            "conso_totale_a_usages_thermosensibles_mwh": True
-        },
-        title="Part de la consommation thermosensible par région",
-        labels={"part_thermosensible": "Part thermosensible (%)"}
-    )
-    fig.update_geos(fitbounds="locations", visible=False)
-    st.plotly_chart(fig)
+        # Carte choroplèthe
+        st.subheader("Part de la consommation thermosensible par région")
+        fig = carte_regions(
+            filtered_df,
+            "part_thermosensible",
+            color_continuous_scale="RdBu_r",
+            hover_name="nom_region",
+            hover_data={
+                "part_thermosensible": True,
+                "conso_totale_a_usages_thermosensibles_mwh": True
+            },
+            title="Part de la consommation thermosensible par région",
+            labels={"part_thermosensible": "Part thermosensible (%)"}
+        )
+        st.plotly_chart(fig)
 
-    # Graphique à nuage de points
-    st.subheader("Relation entre la thermosensibilité et les DJU")
-    fig = px.scatter(
-        filtered_df,
-        x="dju_a_tr",
-        y="thermosensibilite_totale_kwh_dju",
-        hover_name="nom_region",
-        hover_data={
-            "dju_a_tr": True,
-            "thermosensibilite_totale_kwh_dju": True
-        },
-        title="Relation entre la thermosensibilité et les DJU",
-        labels={
-            "dju_a_tr": "DJU (base température de référence)",
-            "thermosensibilite_totale_kwh_dju": "Thermosensibilité totale (kWh/DJU)"
-        }
-    )
-    st.plotly_chart(fig)
+        # Graphique à nuage de points
+        st.subheader("Relation entre la thermosensibilité et les DJU")
+        fig = px.scatter(
+            filtered_df,
+            x="dju_a_tr",
+            y="thermosensibilite_totale_kwh_dju",
+            hover_name="nom_region",
+            hover_data={
+                "dju_a_tr": True,
+                "thermosensibilite_totale_kwh_dju": True
+            },
+            title="Relation entre la thermosensibilité et les DJU",
+            labels={
+                "dju_a_tr": "DJU (base température de référence)",
+                "thermosensibilite_totale_kwh_dju": "Thermosensibilité totale (kWh/DJU)"
+            }
+        )
+        st.plotly_chart(fig)
 
     # 3.4 Caractéristiques du logement (filtrage par année et région)
 
     st.header("Caractéristiques du logement")
-    filtered_df = df[(df["annee"] == annee_selected) & (df["nom_region"] == region_selected)]
+    if not colonnes_manquantes(cube, ["nombre_d_habitants"] + COLONNES_LOGEMENT):
+        filtered_df = cube.slice(annee=annee_selected, nom_region=region_selected).rollup(["filiere"])
+
+        # Calcul de la consommation par habitant pour chaque filière
+        filtered_df = add_ratios(filtered_df, ["conso_par_habitant"])
+
+        # Graphiques en barres
+        for caractéristique in COLONNES_LOGEMENT:
+            st.subheader(f"Consommation d'énergie par habitant en fonction de {caractéristique}")
+            fig = px.bar(
+                filtered_df,
+                x=caractéristique,
+                y="conso_par_habitant",
+                color="filiere",
+                labels={"conso_par_habitant": "Consommation par habitant (MWh)"},
+                hover_data={caractéristique: True, "conso_par_habitant": True, "filiere": True}
+            )
+            st.plotly_chart(fig)
 
-    # Calcul de la consommation par habitant pour chaque ligne
-    filtered_df["conso_par_habitant"] = filtered_df["conso_totale"] / filtered_df["nombre_d_habitants"]
+    # 3.5 Comparaison de la consommation moyenne par habitant entre les régions (avec sélection par année)
+
+    st.subheader("Consommation moyenne par habitant et par région")
+    if not colonnes_manquantes(cube, ["nombre_d_habitants"]):
+        # Calculer la consommation moyenne par habitant pour chaque région
+        # (sommes par région puis division colonne à colonne)
+        region_conso = add_ratios(cube.slice(annee=annee_selected).rollup(["nom_region"]), ["conso_par_habitant"])
+        region_conso = region_conso.sort_values("conso_par_habitant", ascending=False)
 
-    # Graphiques en barres
-    caractéristiques = ["taux_de_logements_collectifs", "taux_de_chauffage_electrique", "taux_de_residences_principales"]
-    for caractéristique in caractéristiques:
-        st.subheader(f"Consommation d'énergie par habitant en fonction de {caractéristique}")
         fig = px.bar(
-            filtered_df,
-            x=caractéristique,
+            region_conso,
+            x="nom_region",
             y="conso_par_habitant",
-            color="filiere",
-            labels={"conso_par_habitant": "Consommation par habitant (MWh)"},
-            hover_data={caractéristique: True, "conso_par_habitant": True, "filiere": True}
+            title=f"Consommation moyenne d'énergie par habitant en {annee_selected}",
+            labels={"conso_par_habitant": "Consommation moyenne par habitant (MWh)", "nom_region": "Région"}
         )
         st.plotly_chart(fig)
 
-    # 3.5 Comparaison de la consommation moyenne par habitant entre les régions (avec sélection par année)
-
-    st.subheader("Consommation moyenne par habitant et par région")
-    # Calculer la consommation moyenne par habitant pour chaque région
-    region_conso = df[df["annee"] == annee_selected].groupby("nom_region").apply(lambda x: x["conso_totale"].sum() / x["nombre_d_habitants"].sum()).sort_values(ascending=False)
-
-    fig = px.bar(
-        region_conso,
-        x=region_conso.index,
-        y=region_conso.values,
-        title=f"Consommation moyenne d'énergie par habitant en {annee_selected}",
-        labels={"y": "Consommation moyenne par habitant (MWh)", "nom_region": "Région"}
-    )
-    st.plotly_chart(fig)
-
     # 3.6 Top 5 des régions les plus consommatrices (avec sélection par année)
 
     st.header("Analyses complémentaires")
     st.subheader("Top 5 des régions les plus consommatrices")
 
-    top_regions = df.groupby(["annee", "nom_region"])["conso_totale"].sum().reset_index()
-    top_regions = top_regions[top_regions["annee"] == annee_selected].sort_values(by="conso_totale", ascending=False).head(5)
+    top_regions = cube.slice(annee=annee_selected).rollup(["nom_region"]).nlargest(5, "conso_totale")
     fig = px.bar(
         top_regions,
         x="nom_region",
@@ -298,41 +409,44 @@ elif page_selected == "Dashboard":
     st.plotly_chart(fig)
 
     # 3.7 Analyse de la thermosensibilité par DJU (Degrés Jour Unifiés)
-    # (Utilise le dataframe complet pour observer les tendances générales)
+    # (Toutes les années, une valeur par année et par région)
 
     st.subheader("Analyse de la thermosensibilité par DJU")
-    dju_type = st.sidebar.selectbox("Type de DJU", ["dju_a_tr", "dju_a_tn"]) # Selection dans la sidebar
-    fig = px.scatter(
-        df.dropna(),
-        x=dju_type,
-        y="thermosensibilite_totale_kwh_dju",
-        color="nom_region",
-        hover_name="nom_region",
-        hover_data={
-            dju_type: True,
-            "thermosensibilite_totale_kwh_dju": True
-        },
-        title=f"Relation entre la thermosensibilité et les {dju_type}",
-        labels={
-            dju_type: f"{dju_type}",
-            "thermosensibilite_totale_kwh_dju": "Thermosensibilité totale (kWh/DJU)"
-        }
-    )
-    st.plotly_chart(fig)
+    if not colonnes_manquantes(cube, ["dju_a_tr", "dju_a_tn", "thermosensibilite_totale_kwh_dju"]):
+        dju_type = st.sidebar.selectbox("Type de DJU", ["dju_a_tr", "dju_a_tn"]) # Selection dans la sidebar
+        fig = px.scatter(
+            cube.rollup(["annee", "nom_region"]),
+            x=dju_type,
+            y="thermosensibilite_totale_kwh_dju",
+            color="nom_region",
+            hover_name="nom_region",
+            hover_data={
+                dju_type: True,
+                "thermosensibilite_totale_kwh_dju": True
+            },
+            title=f"Relation entre la thermosensibilité et les {dju_type}",
+            labels={
+                dju_type: f"{dju_type}",
+                "thermosensibilite_totale_kwh_dju": "Thermosensibilité totale (kWh/DJU)"
+            }
+        )
+        st.plotly_chart(fig)
 
     # 3.8 Carte 3D: Consommation d'énergie par région 
     # (filtrage par année, filière et secteur)
 
     st.header("Carte 3D de la consommation par région")
 
-    # Filtrer le DataFrame en fonction des selections de la sidebar
-    filtered_df = df[(df["annee"] == annee_selected) & (df["filiere"] == filiere_selected) & (df["code_grand_secteur"] == secteur_selected)]
+    # Tranche du cube agrégée par région (centroïdes inclus)
+    geo_df = cube.slice(annee=annee_selected, filiere=filiere_selected, code_grand_secteur=secteur_selected).rollup(["code_region", "nom_region"])
 
-    # Calculer la consommation par habitant pour chaque ligne
-    filtered_df["conso_par_habitant"] = filtered_df["conso_totale"] / filtered_df["nombre_d_habitants"]
-
-    # Grouper les données pour la carte 3D 
-    geo_df = filtered_df.groupby(["code", "nom_region", "longitude", "latitude"])[["conso_totale", "conso_par_habitant"]].sum().reset_index()
+    # Calculer la consommation par habitant pour chaque région (si les habitants sont connus),
+    # formatée d'un bloc dans une colonne texte pour les infobulles
+    if "nombre_d_habitants" in cube.table:
+        geo_df = add_ratios(geo_df, ["conso_par_habitant"])
+        geo_df["conso_par_habitant_txt"] = np.char.mod("%.2f", geo_df["conso_par_habitant"].to_numpy())
+    else:
+        geo_df["conso_par_habitant_txt"] = "n.d."
 
     # Pydeck: configuration de la carte 3D
     view_state = pdk.ViewState(latitude=46.2276, longitude=2.2137, zoom=5, pitch=45)
@@ -348,16 +462,29 @@ elif page_selected == "Dashboard":
         auto_highlight=True
     )
 
-    # Infobulles dynamiques (correction)
-    for i in range(len(geo_df)):
-        geo_df["conso_par_habitant"][i] = f'{geo_df["conso_par_habitant"][i]:.2f}' 
-
+    # Infobulles dynamiques
     tooltip = {
         "html": "<b>Région:</b> {nom_region} <br/>"
                 "<b>Consommation totale:</b> {conso_totale} MWh <br/>"
-                "<b>Consommation par habitant:</b> {conso_par_habitant} MWh",
+                "<b>Consommation par habitant:</b> {conso_par_habitant_txt} MWh",
         "style": {"backgroundColor": "steelblue", "color": "white"}
     }
 
     # Afficher la carte 3D
-    st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip=tooltip))
\ No newline at end of file
+    st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip=tooltip))
+
+    # 3.9 Détail par département (fichiers communes / IRIS uniquement)
+    # (filtrage par année, filière, secteur et région)
+
+    if granularite in FICHIERS_DETAIL:
+        st.header("Détail par département")
+        dep_df = detail_departements(granularite, cle, annee_selected, filiere_selected, secteur_selected, region_selected)
+        fig = px.bar(
+            dep_df,
+            x="nom_departement",
+            y="conso_totale",
+            color="operateur",
+            title=f"Consommation par département ({region_selected}, {annee_selected})",
+            labels={"conso_totale": "Consommation totale (MWh)", "nom_departement": "Département"}
+        )
+        st.plotly_chart(fig)
\ No newline at end of file
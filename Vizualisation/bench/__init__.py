@@ -0,0 +1 @@
+"""Headless benchmarks for the Streamlit dashboards (see ``bench.run``)."""
@@ -0,0 +1,353 @@
+"""Seeded synthetic inputs in the dashboards' on-disk formats.
+
+``uber.csv`` has to be downloaded by hand (see ``Help.txt``) and the other
+inputs are small, so benchmarks and scale tests generate their own data::
+
+    cd Vizualisation
+    python -m bench.datasets uber project/uber-synthetic.csv --rows 10M
+    python -m bench.datasets tips project/tips.csv --rows 100k --seed 3
+    python -m bench.datasets energy Elec/conso.csv --rows 1M
+    python -m bench.datasets communes Elec/consommation-synthetique-par-commune.csv --rows 10M
+
+The schemas are those the dashboards read: ``Date/Time,Lat,Lon,Base`` for
+Uber, the seven ``tips.csv`` columns, and the 40 ``;``-separated columns of
+the regional energy file (with its byte-order mark), and the shorter
+``conso``/``pdl`` layout of the commune-level export. Values follow the
+shapes of the real data (pick-up hot spots and a daily demand curve,
+tips proportional to the bill, consistent energy totals and averages) so
+the charts look and cost the same as with real inputs.
+
+Rows are drawn in blocks of ``CHUNK_ROWS``, each with its own generator
+seeded from ``(seed, block)``, and appended to the file block by block, so
+memory stays flat whatever the size (up to 100M rows and beyond RAM) and
+the same seed and size always give the same file.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.uber_store import DATETIME_FORMAT
+
+CHUNK_ROWS = 500_000
+
+# Share of the April 2014 pick-ups per base.
+UBER_BASES = {"B02512": 0.064, "B02598": 0.324, "B02617": 0.191, "B02682": 0.404, "B02764": 0.017}
+# Relative demand per hour of the day (0h..23h) and per weekday (Monday first).
+UBER_HOURLY = [
+    4.4, 2.6, 1.9, 2.6, 3.4, 4.2, 6.4, 8.6, 8.0, 6.2, 5.7, 5.9,
+    6.7, 7.6, 9.7, 11.7, 13.4, 14.6, 14.0, 12.3, 11.5, 11.2, 10.0, 7.0,
+]
+UBER_WEEKDAYS = [0.86, 0.98, 1.12, 1.03, 1.04, 0.89, 0.82]
+# (lat, lon, spread in degrees, share) of the pick-up hot spots.
+UBER_HOTSPOTS = [
+    (40.755, -73.984, 0.012, 0.34),  # Midtown
+    (40.724, -73.998, 0.012, 0.20),  # Downtown
+    (40.779, -73.965, 0.015, 0.12),  # Upper East / West Side
+    (40.706, -73.953, 0.020, 0.10),  # North Brooklyn
+    (40.745, -73.890, 0.030, 0.06),  # Queens
+    (40.769, -73.869, 0.004, 0.04),  # LaGuardia
+    (40.645, -73.782, 0.005, 0.04),  # JFK
+]
+# Rough bounding box of the five boroughs, for the scattered remainder;
+# some of these points fall outside every borough on purpose.
+NYC_BOUNDS = (-74.26, 40.49, -73.70, 40.92)
+
+TIPS_DAYS = {"Thur": 0.254, "Fri": 0.078, "Sat": 0.357, "Sun": 0.311}
+TIPS_LUNCH = {"Thur": 0.98, "Fri": 0.37, "Sat": 0.0, "Sun": 0.0}
+TIPS_SIZES = [0.016, 0.639, 0.156, 0.152, 0.020, 0.017]
+
+ENERGY_REGIONS = {
+    11: "Île-de-France",
+    24: "Centre-Val de Loire",
+    32: "Hauts-de-France",
+    44: "Grand Est",
+    53: "Bretagne",
+    75: "Nouvelle-Aquitaine",
+    84: "Auvergne-Rhône-Alpes",
+    93: "Provence-Alpes-Côte d'Azur",
+}
+# Départements of each region, for the commune-level rows.
+ENERGY_DEPARTEMENTS = {
+    11: ["75", "77", "78", "91", "92", "93", "94", "95"],
+    24: ["18", "28", "36", "37", "41", "45"],
+    32: ["02", "59", "60", "62", "80"],
+    44: ["08", "10", "51", "52", "54", "55", "57", "67", "68", "88"],
+    53: ["22", "29", "35", "56"],
+    75: ["16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"],
+    84: ["01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74"],
+    93: ["04", "05", "06", "13", "83", "84"],
+}
+COMMUNES_PER_DEPARTEMENT = 400
+ENERGY_SECTORS = ["AGRICULTURE", "INDUSTRIE", "TERTIAIRE", "RESIDENTIEL", "INCONNU"]
+ENERGY_OPERATORS = {"Enedis": 0.45, "GRDF": 0.30, "EdF-SEI": 0.10, "RTE": 0.08, "GRT Gaz": 0.07}
+ENERGY_YEARS = (2011, 2022)
+# (median sites, median MWh per site) per sector.
+ENERGY_SCALE = {
+    "AGRICULTURE": (40, 120.0),
+    "INDUSTRIE": (13, 2500.0),
+    "TERTIAIRE": (20, 330.0),
+    "RESIDENTIEL": (3500, 5.4),
+    "INCONNU": (100, 55.0),
+}
+HOUSING_SURFACES = ["30_m2", "30_a_40_m2", "40_a_60_m2", "60_a_80_m2", "80_a_100_m2", "100_m2"]
+HOUSING_PERIODS = [
+    "avant_1919", "de_1919_a_1945", "de_1946_a_1970", "de_1971_a_1990",
+    "de_1991_a_2005", "de_2006_a_2015", "apres_2016",
+]
+ENERGY_COLUMNS = [
+    "operateur", "filiere", "annee", "code_region", "nom_region",
+    "code_categorie_consommation", "code_grand_secteur", "code_secteur_naf2",
+    "nb_sites", "conso_totale_mwh", "conso_moyenne_mwh", "nombre_de_mailles_secretisees",
+    "part_thermosensible", "conso_totale_a_usages_thermosensibles_mwh",
+    "conso_totale_a_usages_non_thermosensibles_mwh", "thermosensibilite_totale_kwh_dju",
+    "conso_totale_corrigee_de_l_alea_climatique_a_usages_thermosensibles_mwh",
+    "conso_moyenne_a_usages_thermosensibles_mwh", "conso_moyenne_a_usages_non_thermosensibles_mwh",
+    "thermosensibilite_moyenne_kwh_dju",
+    "conso_moyenne_corrigee_de_l_alea_climatique_a_usages_thermosensibles_mwh",
+    "dju_a_tr", "dju_a_tn", "nombre_d_habitants", "taux_de_logements_collectifs",
+    "taux_de_residences_principales",
+    *(f"superficie_des_logements_{s}" for s in HOUSING_SURFACES),
+    *(f"residences_principales_{p}" for p in HOUSING_PERIODS),
+    "taux_de_chauffage_electrique",
+]
+
+
+def _blocks(rows, seed, chunk_rows=CHUNK_ROWS):
+    """``(n, rng)`` per block; each block's generator depends only on ``(seed, block)``."""
+    for block, start in enumerate(range(0, rows, chunk_rows)):
+        yield min(chunk_rows, rows - start), np.random.default_rng([seed, block])
+
+
+def _write_chunks(path, frames, **options):
+    for i, frame in enumerate(frames):
+        frame.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False, **options)
+    return path
+
+
+def _shares(weights):
+    keys = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return keys, p / p.sum()
+
+
+def _month_minutes(year, month):
+    """Every minute of the month as ``Date/Time`` text, and its relative demand."""
+    minutes = pd.date_range(f"{year:04d}-{month:02d}-01", periods=31 * 24 * 60, freq="min")
+    minutes = minutes[minutes.month == month]
+    weights = np.asarray(UBER_HOURLY)[minutes.hour] * np.asarray(UBER_WEEKDAYS)[minutes.weekday]
+    return np.asarray(minutes.strftime(DATETIME_FORMAT), dtype=object), weights / weights.sum()
+
+
+def write_uber(path, rows, year=2014, month=4, seed=0):
+    """Raw Uber pick-ups for one month (``Date/Time,Lat,Lon,Base``)."""
+    labels, minute_p = _month_minutes(year, month)
+    bases, base_p = _shares(UBER_BASES)
+    spots = np.array(UBER_HOTSPOTS)
+    spot_p = np.append(spots[:, 3], max(0.0, 1 - spots[:, 3].sum()))
+    lon0, lat0, lon1, lat1 = NYC_BOUNDS
+
+    def frames():
+        for n, rng in _blocks(rows, seed):
+            spot = rng.choice(len(spot_p), n, p=spot_p / spot_p.sum())
+            scattered = spot == len(spots)
+            lat = np.empty(n)
+            lon = np.empty(n)
+            lat[scattered] = rng.uniform(lat0, lat1, scattered.sum())
+            lon[scattered] = rng.uniform(lon0, lon1, scattered.sum())
+            near = spots[spot[~scattered]]
+            lat[~scattered] = rng.normal(near[:, 0], near[:, 2])
+            lon[~scattered] = rng.normal(near[:, 1], near[:, 2] * 1.3)
+            yield pd.DataFrame(
+                {
+                    "Date/Time": labels[rng.choice(len(labels), n, p=minute_p)],
+                    "Lat": lat.round(4),
+                    "Lon": lon.round(4),
+                    "Base": bases[rng.choice(len(bases), n, p=base_p)],
+                }
+            )
+
+    return _write_chunks(path, frames())
+
+
+def write_tips(path, rows, seed=0):
+    """Restaurant bills in the layout of ``tips.csv``."""
+    days, day_p = _shares(TIPS_DAYS)
+    lunch_p = np.array([TIPS_LUNCH[day] for day in days])
+    size_p = np.asarray(TIPS_SIZES) / sum(TIPS_SIZES)
+
+    def frames():
+        for n, rng in _blocks(rows, seed):
+            day = rng.choice(len(days), n, p=day_p)
+            size = rng.choice(np.arange(1, 7), n, p=size_p)
+            smoker = rng.random(n) < 0.38
+            total_bill = np.round(3.0 + rng.gamma(4.0, 1.9, n) * size**0.75, 2)
+            # Smokers tip less predictably.
+            rate = rng.normal(0.16, np.where(smoker, 0.08, 0.045))
+            yield pd.DataFrame(
+                {
+                    "total_bill": total_bill,
+                    "tip": np.round(np.maximum(total_bill * np.clip(rate, 0.03, 0.7), 1.0), 2),
+                    "sex": np.where(rng.random(n) < 0.64, "Male", "Female"),
+                    "smoker": np.where(smoker, "Yes", "No"),
+                    "day": days[day],
+                    "time": np.where(rng.random(n) < lunch_p[day], "Lunch", "Dinner"),
+                    "size": size,
+                }
+            )
+
+    return _write_chunks(path, frames(), quoting=csv.QUOTE_NONNUMERIC)
+
+
+def write_energy(path, rows, seed=0):
+    """Regional consumption rows in the full ``;``-separated layout read by ``elec.py``."""
+    codes = np.array(list(ENERGY_REGIONS))
+    names = np.array(list(ENERGY_REGIONS.values()), dtype=object)
+    operators, operator_p = _shares(ENERGY_OPERATORS)
+    sectors = np.array(ENERGY_SECTORS, dtype=object)
+    sites_median = np.array([ENERGY_SCALE[s][0] for s in ENERGY_SECTORS], dtype=float)
+    mwh_median = np.array([ENERGY_SCALE[s][1] for s in ENERGY_SECTORS])
+
+    def frames():
+        for n, rng in _blocks(rows, seed):
+            region = rng.integers(0, len(codes), n)
+            sector = rng.integers(0, len(sectors), n)
+            residential = sectors[sector] == "RESIDENTIEL"
+            nb_sites = np.ceil(sites_median[sector] * rng.lognormal(0.0, 1.0, n))
+            conso_moyenne = mwh_median[sector] * rng.lognormal(0.0, 0.5, n)
+            conso = nb_sites * conso_moyenne
+            part = rng.uniform(20, 70, n)
+            thermo = conso * part / 100
+            dju_tr = rng.normal(2000, 300, n)
+            sensibilite = thermo * 1000 / dju_tr
+            corrigee = thermo * rng.normal(1.0, 0.05, n)
+            habitants = np.round(nb_sites * rng.uniform(1.8, 2.4, n))
+
+            def res(values):
+                return np.where(residential, values, np.nan)
+
+            frame = {
+                "operateur": operators[rng.choice(len(operators), n, p=operator_p)],
+                "filiere": np.where(rng.random(n) < 0.6, "Electricité", "Gaz"),
+                "annee": rng.integers(ENERGY_YEARS[0], ENERGY_YEARS[1] + 1, n),
+                "code_region": codes[region],
+                "nom_region": names[region],
+                "code_categorie_consommation": np.where(residential, "RES", "ENT"),
+                "code_grand_secteur": sectors[sector],
+                "code_secteur_naf2": np.nan,
+                "nb_sites": nb_sites,
+                "conso_totale_mwh": conso,
+                "conso_moyenne_mwh": conso_moyenne,
+                "nombre_de_mailles_secretisees": np.where(rng.random(n) < 0.1, rng.integers(1, 50, n), 0),
+                "part_thermosensible": res(part.round(2)),
+                "conso_totale_a_usages_thermosensibles_mwh": res(thermo),
+                "conso_totale_a_usages_non_thermosensibles_mwh": res(conso - thermo),
+                "thermosensibilite_totale_kwh_dju": res(sensibilite),
+                "conso_totale_corrigee_de_l_alea_climatique_a_usages_thermosensibles_mwh": res(corrigee),
+                "conso_moyenne_a_usages_thermosensibles_mwh": res(thermo / nb_sites),
+                "conso_moyenne_a_usages_non_thermosensibles_mwh": res((conso - thermo) / nb_sites),
+                "thermosensibilite_moyenne_kwh_dju": res(sensibilite / nb_sites),
+                "conso_moyenne_corrigee_de_l_alea_climatique_a_usages_thermosensibles_mwh": res(corrigee / nb_sites),
+                "dju_a_tr": res(dju_tr),
+                "dju_a_tn": res(dju_tr * rng.normal(0.95, 0.03, n)),
+                "nombre_d_habitants": res(habitants),
+                "taux_de_logements_collectifs": res(rng.uniform(10, 70, n)),
+                "taux_de_residences_principales": res(rng.uniform(60, 95, n)),
+            }
+            homes = habitants / 2.2
+            for column, share in zip(HOUSING_SURFACES, rng.dirichlet(np.ones(6) * 5, n).T):
+                frame[f"superficie_des_logements_{column}"] = res(homes * share)
+            for column, share in zip(HOUSING_PERIODS, rng.dirichlet(np.ones(7) * 5, n).T):
+                frame[f"residences_principales_{column}"] = res(homes * share)
+            frame["taux_de_chauffage_electrique"] = res(rng.uniform(10, 60, n))
+            # Measures are written to the kWh: shorter text, much faster to format
+            yield pd.DataFrame(frame, columns=ENERGY_COLUMNS).round(3)
+
+    return _write_chunks(path, frames(), sep=";", encoding="utf-8-sig")
+
+
+def write_energy_communes(path, rows, seed=0):
+    """Commune-level consumption rows in the ``conso``/``pdl`` layout of the finer exports."""
+    departements = np.array(
+        [(code, d, ENERGY_REGIONS[code]) for code, ds in ENERGY_DEPARTEMENTS.items() for d in ds], dtype=object
+    )
+    operators, operator_p = _shares(ENERGY_OPERATORS)
+    sectors = np.array(ENERGY_SECTORS, dtype=object)
+    sites_median = np.array([ENERGY_SCALE[s][0] for s in ENERGY_SECTORS], dtype=float)
+    mwh_median = np.array([ENERGY_SCALE[s][1] for s in ENERGY_SECTORS])
+
+    def frames():
+        for n, rng in _blocks(rows, seed):
+            departement = rng.integers(0, len(departements), n)
+            region = departements[departement, 0].astype(int)
+            code_dep = departements[departement, 1]
+            commune = rng.integers(1, COMMUNES_PER_DEPARTEMENT + 1, n)
+            sector = rng.integers(0, len(sectors), n)
+            residential = sectors[sector] == "RESIDENTIEL"
+            # A commune has far fewer sites than a whole region
+            pdl = np.ceil(sites_median[sector] / 50 * rng.lognormal(0.0, 1.0, n))
+            habitants = np.round(pdl * rng.uniform(1.8, 2.4, n))
+            yield pd.DataFrame(
+                {
+                    "operateur": operators[rng.choice(len(operators), n, p=operator_p)],
+                    "annee": rng.integers(ENERGY_YEARS[0], ENERGY_YEARS[1] + 1, n),
+                    "filiere": np.where(rng.random(n) < 0.6, "Electricité", "Gaz"),
+                    "code_region": region,
+                    "libelle_region": departements[departement, 2],
+                    "code_departement": code_dep,
+                    "libelle_departement": "Département " + code_dep,
+                    "code_commune": np.char.add(code_dep.astype(str), np.char.zfill(commune.astype(str), 3)),
+                    "code_grand_secteur": sectors[sector],
+                    "conso": (pdl * mwh_median[sector] * rng.lognormal(0.0, 0.5, n)).round(3),
+                    "pdl": pdl,
+                    "nombre_d_habitants": np.where(residential, habitants, np.nan),
+                    "taux_de_logements_collectifs": np.where(residential, rng.uniform(10, 70, n).round(2), np.nan),
+                    "dju_a_tr": np.where(residential, rng.normal(2000, 300, n).round(1), np.nan),
+                }
+            )
+
+    return _write_chunks(path, frames(), sep=";")
+
+
+def write_energy_regions(path):
+    """Square stand-in geometries for ``ENERGY_REGIONS`` (``code``/``nom`` properties)."""
+    features = []
+    for i, (code, name) in enumerate(ENERGY_REGIONS.items()):
+        x, y = -4 + 2 * (i % 4), 43 + 2 * (i // 4)
+        ring = [[x, y], [x + 2, y], [x + 2, y + 2], [x, y + 2], [x, y]]
+        features.append(
+            {"type": "Feature", "properties": {"code": str(code), "nom": name}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+        )
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    return path
+
+
+WRITERS = {"uber": write_uber, "tips": write_tips, "energy": write_energy, "communes": write_energy_communes}
+
+
+def parse_rows(text):
+    """Row counts such as ``250000``, ``1e6``, ``100k`` or ``10M``."""
+    text = text.strip().replace("_", "")
+    scale = {"k": 10**3, "m": 10**6, "g": 10**9}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic dataset in a dashboard's input format.")
+    parser.add_argument("kind", choices=sorted(WRITERS))
+    parser.add_argument("path", help="CSV to write (overwritten)")
+    parser.add_argument("--rows", type=parse_rows, default=100_000, help="e.g. 1000, 1e6, 100M")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    path = WRITERS[args.kind](args.path, args.rows, seed=args.seed)
+    print(f"{args.rows:,} {args.kind} rows -> {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
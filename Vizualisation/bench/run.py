@@ -0,0 +1,355 @@
+"""Per-stage timings and headless runs of the dashboards on synthetic data.
+
+    cd Vizualisation
+    python -m bench.run --sizes 10000 100000 1000000 --output bench-report.json
+    python -m bench.run --sizes 10000 100000 --compare bench-report.json
+
+For every size, a scratch copy of ``project/`` and ``Elec/`` is laid out
+(static assets linked, CSVs generated by ``bench.datasets``) and measured
+twice over:
+
+* stages: the pipeline steps behind the charts (parse, features, load,
+  filter, aggregate, figure build, serialize) called directly, with wall
+  time and the ``tracemalloc`` peak of each step. Tips also runs its
+  large-data path (sketch, stratified sample, summaries, regression) and
+  the energy data its commune-level store (ingest, rollup), whose totals
+  are checked against the CSVs of two sources sharing a name prefix;
+* apps: ``t2.py``, ``dashboard.py`` and ``elec.py`` under Streamlit's
+  ``AppTest`` (cold run, warm rerun, then every tab or page), with wall time
+  and the process' peak RSS.
+
+The report holds one record per (dataset, rows, stage). ``--compare`` exits
+non-zero when a stage is slower than ``--tolerance`` times the baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import requests
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from bench import datasets
+from common.boroughs import assign_boroughs, borough_names, rides_matrix
+from common.binning import hex_bins, radius_for_zoom
+from common.choropleth import animated_choropleth
+from common.energy_cube import EnergyCube, add_ratios
+from common.energy_store import ingest_energy, rollup_energy
+from common.nyc_geometry import display_path, precise_geometries
+from common.time_index import TripTimeIndex
+from common.tips_charts import density_heatmap, stratified_sample, summary_violin
+from common.tips_sketch import REGRESSION, TipsSketch, ols_fit
+from common.trip_features import add_calendar_features
+from common.uber_cube import TripCube
+from common.uber_months import ingest_months, load_months
+from common.uber_store import DATETIME_FORMAT, RAW_DTYPES
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SIZES = [10_000, 100_000]
+ENERGY_FILE = "consommation-annuelle-d-electricite-et-gaz-par-region.csv"
+# Two exports whose stems share a prefix, as published year by year
+COMMUNES_FILES = [
+    "consommation-annuelle-d-electricite-et-gaz-par-commune.csv",
+    "consommation-annuelle-d-electricite-et-gaz-par-commune-2022.csv",
+]
+# Stages faster than this are too noisy to flag as regressions.
+MIN_SECONDS = 0.05
+
+
+class Recorder:
+    """Collects one record per measured stage."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, dataset, rows, name):
+        """Times the body and records its ``tracemalloc`` peak."""
+        gc.collect()
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            if self.memory:
+                tracemalloc.stop()
+            self.add(dataset, rows, name, seconds, peak_mb=None if peak is None else peak / 1e6)
+
+    def add(self, dataset, rows, name, seconds, **extra):
+        record = {"dataset": dataset, "rows": rows, "stage": name, "seconds": round(seconds, 4)}
+        record.update({k: (round(v, 2) if isinstance(v, float) else v) for k, v in extra.items()})
+        self.records.append(record)
+        print(f"{dataset:>10} {rows:>10,} {name:<28} {seconds:8.3f}s", flush=True)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kB on Linux and in bytes on macOS.
+    scale = 1e6 if sys.platform == "darwin" else 1e3
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _link_assets(source, target, skip):
+    target.mkdir(parents=True, exist_ok=True)
+    for path in source.iterdir():
+        if path.is_file() and path.suffix not in skip and not (target / path.name).exists():
+            (target / path.name).symlink_to(path)
+
+
+def prepare_workdir(workdir, rows):
+    """Scratch copy of the dashboards with ``rows``-sized synthetic inputs."""
+    (workdir / "common").symlink_to(ROOT / "common")
+    project, elec = workdir / "project", workdir / "Elec"
+    _link_assets(ROOT / "project", project, skip={".csv"})
+    _link_assets(ROOT / "Elec", elec, skip={".csv"})
+    datasets.write_uber(project / "uber-bench.csv", rows)
+    datasets.write_tips(project / "tips.csv", rows)
+    datasets.write_energy(elec / ENERGY_FILE, rows)
+    for seed, name in enumerate(COMMUNES_FILES):
+        datasets.write_energy_communes(elec / name, rows // len(COMMUNES_FILES), seed=seed)
+    if not (elec / "regions.geojson").exists():
+        datasets.write_energy_regions(elec / "regions.geojson")
+    return project, elec
+
+
+def bench_uber(rec, project, rows):
+    csv, store, boroughs = project / "uber-bench.csv", project / ".cache" / "uber_months", project / "nyc.geojson"
+    with rec.stage("uber", rows, "parse"):
+        df = pd.read_csv(csv, dtype=RAW_DTYPES)
+        df["Date/Time"] = pd.to_datetime(df["Date/Time"], format=DATETIME_FORMAT)
+    with rec.stage("uber", rows, "features"):
+        df = add_calendar_features(df)
+        df["borough_id"] = assign_boroughs(df["Lon"].to_numpy(), df["Lat"].to_numpy(), precise_geometries(boroughs)[1])
+    del df
+    with rec.stage("uber", rows, "ingest"):
+        ingest_months([csv], store, boroughs_path=boroughs, force=True)
+    with rec.stage("uber", rows, "load"):
+        df = load_months(store)
+    with rec.stage("uber", rows, "filter"):
+        bases = list(df["Base"].cat.categories[:3])
+        filtered = TripTimeIndex(df).filter(df, (5, 20), (6, 18), bases)
+    geojson = json.loads(display_path(boroughs).read_text())
+    with rec.stage("uber", rows, "aggregate"):
+        counts = TripCube.from_frame(df).select((5, 20), (6, 18), bases)
+        counts.by_hour(), counts.by_weekday(), counts.weekday_hour()
+        dates, matrix = rides_matrix(df, len(geojson["features"]))
+    with rec.stage("uber", rows, "figure build"):
+        bins = hex_bins(filtered["Lon"], filtered["Lat"], radius_for_zoom(11))
+        fig = animated_choropleth(geojson, borough_names(geojson), dates, matrix, "Number of Rides")
+    with rec.stage("uber", rows, "serialize"):
+        fig.to_json(), bins.to_json()
+
+
+def bench_tips(rec, project, rows):
+    with rec.stage("tips", rows, "parse"):
+        df = pd.read_csv(project / "tips.csv")
+    with rec.stage("tips", rows, "filter"):
+        filtered = df[df["day"].isin(["Sat", "Sun"]) & (df["smoker"] == "No")]
+    with rec.stage("tips", rows, "figure build"):
+        figs = [
+            px.scatter(filtered, x="total_bill", y="tip", color="day", size="size"),
+            px.violin(filtered, x="day", y="tip", color="sex", box=True, points="all"),
+            px.histogram(filtered, x="tip", nbins=20),
+        ]
+    with rec.stage("tips", rows, "serialize"):
+        [fig.to_json() for fig in figs]
+    # Large-data path of the Tips tab (common/tips_charts.py)
+    with rec.stage("tips", rows, "sketch build"):
+        sketch = TipsSketch.from_frame(df)
+    with rec.stage("tips", rows, "sample"):
+        points = stratified_sample(filtered)
+    with rec.stage("tips", rows, "summaries"):
+        summary = sketch.select(days=["Sat", "Sun"], smokers=["No"])
+        summary.box_stats("tip", by=["day", "sex"]), summary.kde("tip", by=["day", "sex"])
+    with rec.stage("tips", rows, "regression"):
+        x = REGRESSION[0]
+        ols_fit(summary.regression().get(()), np.linspace(filtered[x].min(), filtered[x].max(), 100))
+    with rec.stage("tips", rows, "figure build (summary)"):
+        figs = [
+            density_heatmap(filtered, "total_bill", "tip"),
+            summary_violin(summary, "day", "sex", "tip", points=points),
+        ]
+    with rec.stage("tips", rows, "serialize (summary)"):
+        [fig.to_json() for fig in figs]
+
+
+def bench_energy(rec, elec, rows):
+    with rec.stage("energy", rows, "parse"):
+        df = pd.read_csv(elec / ENERGY_FILE, sep=";")
+    with rec.stage("energy", rows, "aggregate"):
+        df = df.fillna(0)
+        df["conso_totale"] = df["conso_totale_mwh"] + df["conso_totale_a_usages_thermosensibles_mwh"] + df["conso_totale_a_usages_non_thermosensibles_mwh"]
+        cube = EnergyCube.from_frame(df)
+    with rec.stage("energy", rows, "filter"):
+        regions = add_ratios(cube.slice(annee=2020, filiere="Gaz").rollup(["code_region", "nom_region"]))
+    with rec.stage("energy", rows, "figure build"):
+        geojson = json.loads((elec / "regions.geojson").read_text())
+        fig = px.choropleth(regions, geojson=geojson, locations="code_region", featureidkey="properties.code", color="conso_totale")
+    with rec.stage("energy", rows, "serialize"):
+        fig.to_json()
+
+
+def _check_rollup(store, sources):
+    """Raises if the store's total consumption differs from that of ``sources``."""
+    expected = sum(pd.read_csv(path, sep=";", usecols=["conso"])["conso"].sum() for path in sources)
+    stored = rollup_energy(store, level="region")["conso_totale_mwh"].sum()
+    if not np.isclose(stored, expected):
+        raise RuntimeError(f"{store}: {stored:,.0f} MWh stored, {expected:,.0f} MWh in {[p.name for p in sources]}")
+
+
+def bench_energy_communes(rec, elec, rows):
+    store = elec / ".cache" / "energie" / "communes"
+    sources = [elec / name for name in COMMUNES_FILES]
+    with rec.stage("communes", rows, "ingest"):
+        ingest_energy(sources, store, force=True)
+    with rec.stage("communes", rows, "rollup"):
+        rollup_energy(store, level="region")
+    # Neither source may drop the parts of the other, on ingest or removal
+    _check_rollup(store, sources)
+    for kept in sources:
+        ingest_energy([kept], store)
+        _check_rollup(store, [kept])
+    ingest_energy(sources, store)
+    with rec.stage("communes", rows, "rollup (filtered)"):
+        rollup_energy(store, level="departement", annee=2020, filiere="Gaz")
+
+
+def _offline_get(url, *args, **kwargs):
+    """Serves the Lottie URL from the local copy so runs never hit the network."""
+    return types.SimpleNamespace(status_code=200, json=lambda: json.loads((ROOT / "project" / "data.json").read_text()))
+
+
+def _open_dashboard_page(at):
+    navigation = next(r for r in at.sidebar.radio if r.label == "Navigation")
+    navigation.set_value("Dashboard").run()
+
+
+def _run_app(rec, rows, name, at, step, action):
+    start = time.perf_counter()
+    action(at)
+    seconds = time.perf_counter() - start
+    errors = [str(e.value) for e in at.exception]
+    rec.add(name, rows, step, seconds, peak_rss_mb=_peak_rss_mb(), errors=errors)
+
+
+def bench_apps(rec, project, elec, rows, timeout):
+    """Cold run, warm rerun and every tab of the three dashboards."""
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    cwd = os.getcwd()
+    get, requests.get = requests.get, _offline_get
+    try:
+        for script, key in (("t2.py", "tab"), ("dashboard.py", "onglet")):
+            os.chdir(project)
+            at = AppTest.from_file(str(project / script), default_timeout=timeout)
+            _run_app(rec, rows, script, at, "app: cold run", lambda at: at.run())
+            _run_app(rec, rows, script, at, "app: warm rerun", lambda at: at.run())
+            for tab in at.tabs[1:]:
+
+                def select(at, label=tab.label):
+                    at.session_state[key] = label
+                    at.run()
+
+                _run_app(rec, rows, script, at, f"app: tab {tab.label}", select)
+
+        os.chdir(elec)
+        at = AppTest.from_file(str(elec / "elec.py"), default_timeout=timeout)
+        _run_app(rec, rows, "elec.py", at, "app: cold run", lambda at: at.run())
+        _run_app(rec, rows, "elec.py", at, "app: page Dashboard", _open_dashboard_page)
+    finally:
+        requests.get = get
+        os.chdir(cwd)
+
+
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "streamlit": st.__version__,
+    }
+
+
+def compare(records, baseline, tolerance):
+    """Returns the records slower than ``tolerance`` x their baseline stage."""
+    reference = {(r["dataset"], r["rows"], r["stage"]): r["seconds"] for r in baseline["records"]}
+    regressions = []
+    for record in records:
+        before = reference.get((record["dataset"], record["rows"], record["stage"]))
+        if before is None or record["seconds"] < MIN_SECONDS:
+            continue
+        ratio = record["seconds"] / max(before, 1e-9)
+        if ratio > tolerance:
+            regressions.append(dict(record, baseline_seconds=before, ratio=round(ratio, 2)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="rows per synthetic dataset")
+    parser.add_argument("--output", default="bench-report.json", help="JSON report to write")
+    parser.add_argument("--compare", default=None, help="baseline report to check against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown ratio")
+    parser.add_argument("--skip-apps", action="store_true", help="only time the pipeline stages")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows Python-heavy stages)")
+    parser.add_argument("--timeout", type=float, default=600, help="AppTest timeout per run, in seconds")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directories")
+    args = parser.parse_args(argv)
+
+    rec = Recorder(memory=not args.no_memory)
+    for rows in args.sizes:
+        workdir = Path(tempfile.mkdtemp(prefix=f"bench-{rows}-"))
+        try:
+            project, elec = prepare_workdir(workdir, rows)
+            bench_uber(rec, project, rows)
+            bench_tips(rec, project, rows)
+            bench_energy(rec, elec, rows)
+            bench_energy_communes(rec, elec, rows)
+            if not args.skip_apps:
+                bench_apps(rec, project, elec, rows, args.timeout)
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": _meta(), "records": rec.records}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+    print(f"report -> {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(rec.records, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['dataset']} {r['rows']:,} {r['stage']}: {r['baseline_seconds']}s -> {r['seconds']}s (x{r['ratio']})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Helpers shared by the Streamlit dashboards in ``Vizualisation``.
+
+The dashboards are run with ``streamlit run`` from their own folder, so each
+script appends the ``Vizualisation`` directory to ``sys.path`` before
+importing from this package.
+"""
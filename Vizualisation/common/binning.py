@@ -0,0 +1,95 @@
+"""Server-side hexagonal binning for the Uber maps.
+
+``HexagonLayer`` and ``px.density_mapbox`` used to receive every filtered
+point, which for a full month is hundreds of MB of JSON per rerun. The
+points are binned here, in NumPy, onto a fixed hexagonal grid and only the
+bin centres and counts are sent to the browser. Small selections are still
+drawn from the raw points.
+"""
+import numpy as np
+import pandas as pd
+
+# Below this many points the raw data is cheap enough to send as-is.
+RAW_POINT_LIMIT = 20_000
+
+# Grid origin; fixed so that bins line up across filter states.
+NYC_CENTER = (40.7128, -74.0060)
+
+METERS_PER_DEGREE = 111_320.0
+SQRT3 = np.sqrt(3.0)
+
+# deck.gl HexagonLayer's default colour range, low to high.
+HEXAGON_COLORS = np.array(
+    [
+        [255, 255, 178],
+        [254, 217, 118],
+        [254, 178, 76],
+        [253, 141, 60],
+        [240, 59, 32],
+        [189, 0, 38],
+    ]
+)
+
+
+def radius_for_zoom(zoom, base_radius=200, base_zoom=11):
+    """Hex radius in metres, doubling for every zoom level out from ``base_zoom``."""
+    return base_radius * 2.0 ** (base_zoom - zoom)
+
+
+def hex_bins(lon, lat, radius_m, origin=NYC_CENTER):
+    """Counts points per pointy-top hexagon of circumradius ``radius_m``.
+
+    Coordinates are projected to metres with an equirectangular projection
+    around ``origin`` (accurate enough at city scale). Returns a frame with
+    the bin centre ``lon``/``lat`` and ``count``.
+    """
+    lat0, lon0 = origin
+    meters_per_lon = METERS_PER_DEGREE * np.cos(np.radians(lat0))
+    x = (np.asarray(lon, dtype=np.float64) - lon0) * meters_per_lon
+    y = (np.asarray(lat, dtype=np.float64) - lat0) * METERS_PER_DEGREE
+
+    q, r = _axial_round((SQRT3 / 3 * x - y / 3) / radius_m, (2 / 3 * y) / radius_m)
+    if len(q) == 0:
+        return pd.DataFrame({"lon": [], "lat": [], "count": []})
+
+    q_min, r_min = q.min(), r.min()
+    width = r.max() - r_min + 1
+    keys, counts = np.unique((q - q_min) * width + (r - r_min), return_counts=True)
+    q, r = keys // width + q_min, keys % width + r_min
+
+    center_x = radius_m * SQRT3 * (q + r / 2)
+    center_y = radius_m * 1.5 * r
+    return pd.DataFrame(
+        {
+            "lon": lon0 + center_x / meters_per_lon,
+            "lat": lat0 + center_y / METERS_PER_DEGREE,
+            "count": counts,
+        }
+    )
+
+
+def _axial_round(q, r):
+    """Rounds fractional axial coordinates to the nearest hexagon (cube rounding)."""
+    s = -q - r
+    rq, rr, rs = np.rint(q), np.rint(r), np.rint(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def add_column_style(bins, elevation_range=(0, 1000)):
+    """Adds ``elevation`` and ``color`` columns mimicking HexagonLayer's scales."""
+    bins = bins.copy()
+    if bins.empty:
+        bins["elevation"] = []
+        bins["color"] = []
+        return bins
+    scaled = bins["count"].to_numpy() / bins["count"].max()
+    low, high = elevation_range
+    bins["elevation"] = low + scaled * (high - low)
+    bucket = np.minimum((scaled * len(HEXAGON_COLORS)).astype(int), len(HEXAGON_COLORS) - 1)
+    bins["color"] = HEXAGON_COLORS[bucket].tolist()
+    return bins
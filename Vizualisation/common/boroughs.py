@@ -0,0 +1,94 @@
+"""Borough assignment for Uber pick-up points.
+
+The Advanced tab used to build a ``GeoDataFrame`` over every trip and run
+``gpd.sjoin`` against ``nyc.geojson`` on each rerun. Here the point-in-polygon
+test is done once, at ingest, and stored as a ``borough_id`` column holding
+the index of the matching feature in the GeoJSON (-1 when outside NYC).
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+DEFAULT_CHUNK_SIZE = 250_000
+NO_BOROUGH = -1
+
+
+def load_borough_geometries(filepath):
+    """Returns ``(names, geometries)`` for the features of a GeoJSON file."""
+    with open(filepath, "r") as f:
+        geojson = json.load(f)
+    names = [feature["properties"]["name"] for feature in geojson["features"]]
+    geometries = np.array([shape(feature["geometry"]) for feature in geojson["features"]])
+    return names, geometries
+
+
+def borough_names(geojson):
+    """Lists the borough names of an already loaded GeoJSON, in feature order."""
+    return [feature["properties"]["name"] for feature in geojson["features"]]
+
+
+def _assign_chunk(lon, lat, geometries, bounds, dtype):
+    """Point-in-polygon for one chunk; the lowest polygon index wins on borders."""
+    out = np.full(len(lon), NO_BOROUGH, dtype=dtype)
+    for i, (geometry, (xmin, ymin, xmax, ymax)) in enumerate(zip(geometries, bounds)):
+        candidates = np.flatnonzero(
+            (out == NO_BOROUGH) & (lon >= xmin) & (lon <= xmax) & (lat >= ymin) & (lat <= ymax)
+        )
+        if len(candidates):
+            hit = shapely.intersects_xy(geometry, lon[candidates], lat[candidates])
+            out[candidates[hit]] = i
+    return out
+
+
+def assign_boroughs(lon, lat, geometries, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Returns the index of the polygon containing each point, or -1.
+
+    Each polygon is prepared once; points are first filtered on its bounding
+    box in NumPy and only the candidates go through ``intersects_xy``. Chunks
+    of ``chunk_size`` points run on a thread pool since shapely releases the
+    GIL inside its vectorized predicates.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    dtype = np.int8 if len(geometries) < np.iinfo(np.int8).max else np.int16
+
+    shapely.prepare(geometries)
+    bounds = shapely.bounds(geometries)
+    result = np.full(len(lon), NO_BOROUGH, dtype=dtype)
+
+    def work(start):
+        stop = min(start + chunk_size, len(lon))
+        result[start:stop] = _assign_chunk(
+            lon[start:stop], lat[start:stop], geometries, bounds, dtype
+        )
+
+    starts = range(0, len(lon), chunk_size)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(work, starts))
+    return result
+
+
+def rides_matrix(df, n_boroughs):
+    """Dense ride counts per date and borough id, from the precomputed ids.
+
+    Returns ``(dates, counts)``: ``dates`` holds the days that have at least
+    one trip, as ``datetime64[D]``, and ``counts[i, j]`` the rides on
+    ``dates[i]`` in feature ``j``. Trips outside every borough are dropped.
+    """
+    days = df["Date/Time"].to_numpy().astype("datetime64[D]")
+    if len(days) == 0:
+        return days, np.zeros((0, n_boroughs), dtype=np.int64)
+    first = days.min()
+    offsets = (days - first).astype(np.int64)
+    n_days = int(offsets.max()) + 1
+    ids = df["borough_id"].to_numpy().astype(np.int64)
+    inside = ids != NO_BOROUGH
+    counts = np.bincount(offsets[inside] * n_boroughs + ids[inside], minlength=n_days * n_boroughs)
+    counts = counts.reshape(n_days, n_boroughs)
+    # Keep only days present in the data (months need not be contiguous).
+    present = np.bincount(offsets, minlength=n_days) > 0
+    return first + np.flatnonzero(present).astype("timedelta64[D]"), counts[present]
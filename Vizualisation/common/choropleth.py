@@ -0,0 +1,72 @@
+"""Animated per-day borough choropleth for the Advanced tab.
+
+``px.choropleth(..., animation_frame="Date")`` over the long-form counts
+emits one complete trace per frame, so the figure grew with every day of
+data. ``animated_choropleth`` takes the dense (dates x boroughs) matrix from
+``boroughs.rides_matrix`` instead: the GeoJSON, the locations and the
+colour scale live on a single trace, and each frame only carries that
+day's ``z`` vector. The dashboards cache the finished figure per dataset
+version.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+NYC_GEO = dict(
+    center=dict(lon=-74.0060, lat=40.7128),
+    fitbounds="locations",
+    projection=dict(type="albers usa", parallels=[30, 40]),
+    showland=True,
+    landcolor="rgb(217, 217, 217)",
+    countrycolor="white",
+)
+
+
+def animated_choropleth(geojson, names, dates, counts, value_name, title=None):
+    """One choropleth trace sharing ``geojson``, with a ``z``-only frame per date."""
+    labels = np.datetime_as_string(dates, unit="D").tolist()
+    zmax = int(counts.max()) if counts.size else 0
+    trace = go.Choropleth(
+        geojson=geojson,
+        locations=list(names),
+        featureidkey="properties.name",
+        z=counts[0] if len(counts) else np.zeros(len(names)),
+        zmin=0,
+        zmax=zmax,
+        colorscale="Viridis",
+        colorbar=dict(title=value_name),
+        hovertemplate="%{location}<br>" + value_name + "=%{z}<extra></extra>",
+    )
+    frames = [go.Frame(name=label, data=[go.Choropleth(z=row)], traces=[0]) for label, row in zip(labels, counts)]
+
+    def animate(frame_names, duration):
+        return [frame_names, {"frame": {"duration": duration, "redraw": True}, "mode": "immediate", "transition": {"duration": 0}}]
+
+    fig = go.Figure(data=[trace], frames=frames)
+    fig.update_geos(scope="north america", **NYC_GEO)
+    fig.update_layout(
+        title=title,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        updatemenus=[
+            {
+                "type": "buttons",
+                "direction": "left",
+                "x": 0.1,
+                "y": 0,
+                "xanchor": "right",
+                "yanchor": "top",
+                "buttons": [
+                    {"label": "&#9654;", "method": "animate", "args": animate(None, 500)},
+                    {"label": "&#9724;", "method": "animate", "args": animate([None], 0)},
+                ],
+            }
+        ],
+        sliders=[
+            {
+                "x": 0.1,
+                "len": 0.9,
+                "currentvalue": {"prefix": "Date="},
+                "steps": [{"label": label, "method": "animate", "args": animate([label], 0)} for label in labels],
+            }
+        ],
+    )
+    return fig
@@ -0,0 +1,110 @@
+"""Pre-aggregated energy consumption for the ``elec.py`` dashboard.
+
+Every sidebar change used to re-filter the full regional CSV five or six
+times and regroup it for the top-5 chart. ``EnergyCube`` sums the rows once
+over year x filière x region x sector x operator (collapsing the NAF and
+consumer-category detail no chart uses); each section then slices that
+table and rolls it up to the dimensions it plots.
+
+Ratios are never summed: ``add_ratios`` divides the rolled-up sums column by
+column, so a per-capita figure is total consumption over total inhabitants
+of the group, not a sum of per-row quotients.
+"""
+import numpy as np
+
+DIMENSIONS = ["annee", "filiere", "code_region", "nom_region", "code_grand_secteur", "operateur"]
+
+# Additive measures, summed over the collapsed rows.
+SUMS = [
+    "conso_totale",
+    "conso_totale_mwh",
+    "conso_totale_a_usages_thermosensibles_mwh",
+    "conso_totale_a_usages_non_thermosensibles_mwh",
+    "thermosensibilite_totale_kwh_dju",
+    "nombre_d_habitants",
+    "nb_sites",
+]
+
+# Per (year, region) attributes, repeated on the rows that carry them and 0
+# elsewhere once missing values are filled, so ``max`` recovers them.
+ATTRIBUTES = [
+    "dju_a_tr",
+    "dju_a_tn",
+    "taux_de_logements_collectifs",
+    "taux_de_chauffage_electrique",
+    "taux_de_residences_principales",
+    "longitude",
+    "latitude",
+]
+
+# name -> (numerator, denominator columns, scale), computed on rolled-up sums.
+RATIOS = {
+    "conso_par_habitant": ("conso_totale", ["nombre_d_habitants"], 1),
+    "conso_moyenne_mwh": ("conso_totale_mwh", ["nb_sites"], 1),
+    "part_thermosensible": (
+        "conso_totale_a_usages_thermosensibles_mwh",
+        ["conso_totale_a_usages_thermosensibles_mwh", "conso_totale_a_usages_non_thermosensibles_mwh"],
+        100,
+    ),
+}
+
+
+class EnergyCube:
+    """Consumption sums indexed by ``DIMENSIONS``, one row per non-empty cell."""
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregates the prepared regional frame (missing values filled with 0)."""
+        table = df.groupby(DIMENSIONS, sort=False).agg(_aggregations(df.columns, exclude=DIMENSIONS)).reset_index()
+        return cls(table)
+
+    def values(self, dimension):
+        """Distinct values of a dimension, in order of first appearance."""
+        return self.table[dimension].unique()
+
+    def slice(self, **selection):
+        """Keeps the cells matching every ``dimension=value`` (lists mean "any of").
+
+        ``None`` or an empty list leaves that dimension unfiltered.
+        """
+        mask = np.ones(len(self.table), dtype=bool)
+        for dimension, value in selection.items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            column = self.table[dimension]
+            if isinstance(value, (list, tuple, set)):
+                mask &= column.isin(value).to_numpy()
+            else:
+                mask &= (column == value).to_numpy()
+        return EnergyCube(self.table[mask])
+
+    def rollup(self, by):
+        """Sums (and attribute maxima) grouped by the ``by`` dimensions."""
+        aggregations = _aggregations(self.table.columns, exclude=by)
+        return self.table.groupby(by, sort=False).agg(aggregations).reset_index()
+
+
+def _aggregations(columns, exclude=()):
+    aggregations = {column: "sum" for column in SUMS if column in columns}
+    aggregations.update({column: "max" for column in ATTRIBUTES if column in columns})
+    for column in exclude:
+        aggregations.pop(column, None)
+    return aggregations
+
+
+def add_ratios(table, names=None):
+    """Adds the ``RATIOS`` columns (all by default) to a rolled-up table.
+
+    Groups with a zero denominator get NaN rather than inf.
+    """
+    table = table.copy()
+    for name in RATIOS if names is None else names:
+        numerator, denominators, scale = RATIOS[name]
+        num = table[numerator].to_numpy(dtype=float)
+        den = table[denominators].to_numpy(dtype=float).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table[name] = np.where(den != 0, num / den * scale, np.nan)
+    return table
@@ -0,0 +1,254 @@
+"""Out-of-core store for the commune- and IRIS-level energy files.
+
+The regional CSV read by ``elec.py`` has ~23k rows; the same publisher's
+commune and IRIS files are 100-1000x larger and do not fit comfortably in a
+Streamlit process. ``ingest_energy`` streams them with ``chunksize``, keeps
+only the columns the dashboard aggregates and writes Parquet partitioned by
+year::
+
+    .cache/energie/communes/
+        manifest.json
+        annee=2021/consommation-...-par-commune-0.parquet
+
+IRIS rows split the consumption that commune rows already report, so each
+granularity gets its own store and the two are never summed together. The
+paths given to ``ingest_energy`` are all the files of one store: parts of a
+source that is no longer among them are deleted.
+
+Within a part, rows are sorted by filière then sector and written in row
+groups of ``ROW_GROUP_ROWS``, so their statistics let ``rollup_energy`` skip
+row groups on those columns as well as on the ``annee`` partition.
+``rollup_energy`` scans the store batch by batch and sums each batch down to
+the requested level (region or département), so memory is bounded by the
+number of groups, not by the file.
+
+    python -m common.energy_store Elec/consommation-*-par-commune.csv --store Elec/.cache/energie/communes
+"""
+import argparse
+import glob
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from common.energy_cube import ATTRIBUTES, SUMS
+from common.manifests import file_digest, read_manifest, stat_entry, write_manifest
+
+STORE_VERSION = 2
+DEFAULT_STORE = Path(".cache") / "energie"
+DEFAULT_CHUNKSIZE = 500_000
+# Small enough that one (filière, sector) run spans several row groups
+ROW_GROUP_ROWS = 16_384
+
+# Names used by the finer-grained exports for columns of the regional file.
+COLUMN_ALIASES = {
+    "libelle_region": "nom_region",
+    "libelle_departement": "nom_departement",
+    "conso": "conso_totale_mwh",
+    "pdl": "nb_sites",
+}
+
+KEYS = ["annee", "filiere", "code_grand_secteur", "operateur"]
+LEVELS = {
+    "region": ["code_region", "nom_region"],
+    "departement": ["code_region", "nom_region", "code_departement", "nom_departement"],
+}
+# ``conso_totale`` is derived by the dashboard; longitude/latitude come from
+# the region geometries.
+MEASURES = [c for c in SUMS if c != "conso_totale"]
+STATS = [c for c in ATTRIBUTES if c not in ("longitude", "latitude")]
+# Housing rates are averaged per inhabitant, degree-days per row.
+WEIGHT = "nombre_d_habitants"
+UNWEIGHTED = ["dju_a_tr", "dju_a_tn"]
+
+STORED = KEYS + LEVELS["departement"] + MEASURES + STATS
+STRING_COLUMNS = ["filiere", "code_grand_secteur", "operateur", "nom_region", "code_departement", "nom_departement"]
+
+
+def _canonical(column):
+    return COLUMN_ALIASES.get(column, column)
+
+
+def _compact_chunk(chunk):
+    """Renames aliased columns and narrows the dtypes of a CSV chunk."""
+    chunk = chunk.rename(columns=COLUMN_ALIASES)
+    for column in STRING_COLUMNS:
+        if column in chunk:
+            chunk[column] = chunk[column].astype(str)
+    # Rows without a region cannot be placed on any level
+    chunk = chunk.dropna(subset=["code_region"])
+    chunk["annee"] = chunk["annee"].astype(np.int16)
+    chunk["code_region"] = chunk["code_region"].astype(np.int8)
+    for column in STATS:
+        if column in chunk:
+            chunk[column] = chunk[column].astype(np.float32)
+    return chunk
+
+
+def _source_parts(store_dir, stem):
+    """Part files of ``stem`` (``{stem}-<chunk>.parquet``), not those of sources named ``{stem}-...``."""
+    pattern = re.compile(re.escape(stem) + r"-\d+")
+    return [part for part in store_dir.glob(f"annee=*/{glob.escape(stem)}-*.parquet") if pattern.fullmatch(part.stem)]
+
+
+def _remove_source(store_dir, stem):
+    for old in _source_parts(store_dir, stem):
+        old.unlink()
+
+
+def _ingest_source(source, store_dir, chunksize):
+    """Streams one CSV into per-year part files and returns the years it covers."""
+    _remove_source(store_dir, source.stem)
+
+    years = set()
+    reader = pd.read_csv(
+        source,
+        sep=";",
+        usecols=lambda c: _canonical(c) in STORED,
+        dtype={"code_departement": str, "libelle_departement": str, "nom_departement": str},
+        chunksize=chunksize,
+    )
+    for i, chunk in enumerate(reader):
+        chunk = _compact_chunk(chunk)
+        for year, part in chunk.groupby("annee", sort=False):
+            year_dir = store_dir / f"annee={year}"
+            year_dir.mkdir(parents=True, exist_ok=True)
+            part = part.drop(columns="annee").sort_values(["filiere", "code_grand_secteur"], kind="stable")
+            part.to_parquet(year_dir / f"{source.stem}-{i}.parquet", index=False, row_group_size=ROW_GROUP_ROWS)
+            years.add(int(year))
+    return sorted(years)
+
+
+def ingest_energy(paths, store_dir=DEFAULT_STORE, chunksize=DEFAULT_CHUNKSIZE, force=False):
+    """Brings the store up to date with the given CSV files.
+
+    Sources whose size and mtime match the manifest are skipped; a change of
+    ``STORE_VERSION`` rebuilds everything. Parts of sources that are not in
+    ``paths`` are removed.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_dir / "manifest.json"
+
+    manifest = read_manifest(manifest_path)
+    if force or manifest is None or manifest.get("version") != STORE_VERSION:
+        for old in store_dir.glob("annee=*"):
+            shutil.rmtree(old)
+        manifest = {"version": STORE_VERSION, "sources": {}}
+
+    for path in map(Path, paths):
+        stat = stat_entry(path)
+        entry = manifest["sources"].get(path.stem)
+        if entry is not None and entry["inputs"] == stat:
+            continue
+        digest = file_digest(path)
+        if entry is None or entry["sha1"] != digest:
+            years = _ingest_source(path, store_dir, chunksize)
+        else:
+            years = entry["years"]
+        manifest["sources"][path.stem] = {"inputs": stat, "sha1": digest, "years": years}
+        write_manifest(manifest, manifest_path)
+
+    stems = {Path(p).stem for p in paths}
+    removed = [stem for stem in manifest["sources"] if stem not in stems]
+    for stem in removed:
+        _remove_source(store_dir, stem)
+        del manifest["sources"][stem]
+    if removed:
+        write_manifest(manifest, manifest_path)
+    return manifest
+
+
+def store_version(store_dir=DEFAULT_STORE):
+    """Short key identifying the store's content, for use in cache keys."""
+    manifest = read_manifest(Path(store_dir) / "manifest.json") or {}
+    sources = sorted((name, entry["sha1"]) for name, entry in manifest.get("sources", {}).items())
+    key = json.dumps([manifest.get("version"), sources])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _dataset(store_dir):
+    files = sorted(str(f) for f in Path(store_dir).glob("annee=*/[!.]*.parquet"))
+    if not files:
+        raise ValueError(f"no energy data in {store_dir}")
+    return ds.dataset(files, format="parquet", partitioning="hive", partition_base_dir=str(store_dir))
+
+
+def _filter_expression(filters):
+    """``column == value`` (or ``isin`` for lists) for every non-empty filter."""
+    expression = None
+    for column, value in filters.items():
+        if value is None or (isinstance(value, (list, tuple, set)) and not value):
+            continue
+        field = ds.field(column)
+        term = field.isin(list(value)) if isinstance(value, (list, tuple, set)) else field == value
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def rollup_energy(store_dir=DEFAULT_STORE, level="region", batch_size=1 << 18, **filters):
+    """Sums the store down to ``KEYS`` plus the ``level`` columns.
+
+    ``filters`` (``annee=2021``, ``filiere="Gaz"``, lists for "any of") are
+    pushed down to the Parquet scan. Measures are summed; the housing and
+    climate statistics become means per year and area (weighted by
+    inhabitants for the housing rates), repeated on every row of that area
+    like in the regional file.
+    """
+    dataset = _dataset(store_dir)
+    names = set(dataset.schema.names)
+    keys = KEYS + LEVELS[level]
+    measures = [c for c in MEASURES if c in names]
+    stats = [c for c in STATS if c in names and (c in UNWEIGHTED or WEIGHT in names)]
+    columns = keys + measures + stats
+
+    total, partials = None, []
+    for batch in dataset.to_batches(columns=columns, filter=_filter_expression(filters), batch_size=batch_size):
+        frame = batch.to_pandas()
+        weights = frame[WEIGHT].fillna(0).to_numpy() if WEIGHT in frame else None
+        for column in stats:
+            values = frame.pop(column).to_numpy(dtype=float)
+            weight = 1.0 if column in UNWEIGHTED else weights
+            present = ~np.isnan(values)
+            frame[f"{column}__w"] = np.where(present, values * weight, 0.0)
+            frame[f"{column}__n"] = np.where(present, weight, 0.0)
+        partials.append(frame.groupby(keys, sort=False).sum())
+        # Fold the partial sums regularly so they never outgrow the groups.
+        if len(partials) >= 64:
+            total = pd.concat(([total] if total is not None else []) + partials).groupby(level=keys, sort=False).sum()
+            partials = []
+    if partials or total is None:
+        parts = ([total] if total is not None else []) + partials
+        if not parts:
+            return pd.DataFrame(columns=keys + measures + stats)
+        total = pd.concat(parts).groupby(level=keys, sort=False).sum()
+
+    table = total.reset_index()
+    area = ["annee"] + LEVELS[level]
+    for column in stats:
+        sums = table.groupby(area, sort=False)[[f"{column}__w", f"{column}__n"]].transform("sum")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table[column] = np.where(sums.iloc[:, 1] > 0, sums.iloc[:, 0] / sums.iloc[:, 1], np.nan)
+        table = table.drop(columns=[f"{column}__w", f"{column}__n"])
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream commune/IRIS energy CSVs into the Parquet store.")
+    parser.add_argument("paths", nargs="+", help="semicolon-separated CSV exports")
+    parser.add_argument("--store", default=str(DEFAULT_STORE), help="store directory")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--force", action="store_true", help="rebuild every source")
+    args = parser.parse_args(argv)
+    manifest = ingest_energy(args.paths, args.store, args.chunksize, args.force)
+    for name, entry in sorted(manifest["sources"].items()):
+        print(f"{name}: {', '.join(map(str, entry['years']))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""On-click, chunked exports for the "Download filtered data" buttons.
+
+``st.download_button(data=df.to_csv())`` serialised the whole filtered frame
+into one string on every rerun, clicked or not, and Streamlit then kept a
+bytes copy of it. ``download_buttons`` passes callables instead, which
+Streamlit only runs when a button is clicked. They write the frame
+``CHUNK_ROWS`` rows at a time into one ``BytesIO``, which Streamlit reads
+once; no full-size string or Arrow table is built along the way:
+
+* CSV, as before;
+* gzipped CSV, the same text compressed while it is written;
+* Parquet, one row group per chunk, typed and usually the smallest.
+"""
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+CHUNK_ROWS = 100_000
+
+# label -> (file suffix, MIME type)
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "gzipped CSV": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def csv_chunks(df, chunk_rows=CHUNK_ROWS):
+    """The CSV text of ``df`` (header first) as encoded chunks of ``chunk_rows`` rows."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start : start + chunk_rows].to_csv(index=False, header=start == 0).encode()
+
+
+def write_export(df, fmt, target, chunk_rows=CHUNK_ROWS):
+    """Writes ``df`` to the binary file ``target`` in one of ``FORMATS``."""
+    if fmt == "CSV":
+        for chunk in csv_chunks(df, chunk_rows):
+            target.write(chunk)
+    elif fmt == "gzipped CSV":
+        with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=6) as archive:
+            for chunk in csv_chunks(df, chunk_rows):
+                archive.write(chunk)
+    elif fmt == "Parquet":
+        schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+        with pq.ParquetWriter(target, schema) as writer:
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start : start + chunk_rows]
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"unknown export format {fmt!r}")
+    return target
+
+
+def exporter(df, fmt):
+    """Zero-argument callable returning ``df`` exported as ``fmt`` in a ``BytesIO``."""
+
+    def export():
+        return write_export(df, fmt, io.BytesIO())
+
+    return export
+
+
+def download_buttons(df, label, file_stem, key):
+    """One download button per format, each exporting ``df`` only when clicked."""
+    for column, (fmt, (suffix, mime)) in zip(st.columns(len(FORMATS)), FORMATS.items()):
+        column.download_button(
+            label=f"{label} as {fmt}",
+            data=exporter(df, fmt),
+            file_name=file_stem + suffix,
+            mime=mime,
+            key=f"{key}_{fmt}",
+            on_click="ignore",
+        )
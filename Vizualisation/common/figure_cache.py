@@ -0,0 +1,124 @@
+"""Process-wide cache of finished charts, keyed by dataset version and filters.
+
+Every rerun rebuilt each Plotly figure and redrew each matplotlib figure,
+even when neither the data nor the filters had changed, and the
+matplotlib figures were never closed, so pyplot kept every one of them
+alive for the life of the server. The chart helpers here take a ``key``
+(the dataset version and the filter values the chart depends on) and a
+zero-argument function that makes the figure, which only runs on a miss:
+
+* Plotly: the finished ``go.Figure`` is kept. ``st.plotly_chart`` only
+  takes a figure (serialised without validation) or a dict (validated
+  again), so the figure object is the cheapest thing to hand back;
+* matplotlib: the figure is saved to PNG with ``st.pyplot``'s own
+  settings and closed straight away; the bytes are kept. They are scaled
+  down to ``MAX_WIDTH`` first, since Streamlit would otherwise decode and
+  resize them again on every rerun.
+
+Entries are evicted least recently used first once they hold more than
+``MAX_BYTES`` (Plotly figures count their JSON size). ``loaders.clear_caches``
+empties the cache along with the others.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import plotly.io
+import streamlit as st
+from PIL import Image
+
+from common import instrument
+
+MAX_BYTES = 256 * 2**20
+# What st.pyplot passes to savefig
+SAVEFIG = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+# Widest image st.image sends as is
+MAX_WIDTH = 2 * 730
+
+
+class FigureCache:
+    """Thread-safe LRU mapping keys to ``(value, size)``, bounded by total size."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """``(value, size)`` for ``key``, or None; a hit becomes the most recent entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value, size):
+        """Stores ``value``, then evicts the oldest entries until under ``max_bytes``."""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _png(buffer):
+    """``(bytes, size)`` of the PNG in ``buffer``, resized to at most ``MAX_WIDTH`` pixels wide."""
+    buffer.seek(0)
+    image = Image.open(buffer)
+    if image.width > MAX_WIDTH:
+        image = image.resize((MAX_WIDTH, image.height * MAX_WIDTH // image.width), resample=Image.BILINEAR)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    png = buffer.getvalue()
+    return png, len(png)
+
+
+@st.cache_resource(show_spinner=False)
+def _cache():
+    return FigureCache()
+
+
+def plotly_chart(name, key, build, rows=None, **kwargs):
+    """``st.plotly_chart(build())``, building the figure once per ``(name, key)``."""
+    cache = _cache()
+    with instrument.timed(name) as step:
+        entry = cache.get((name, key))
+        if entry is None:
+            fig = build()
+            entry = fig, len(plotly.io.to_json(fig, validate=False))
+            cache.put((name, key), *entry)
+        else:
+            step.name = f"{name} (cached)"
+        step.rows, step.bytes = rows, entry[1]
+        return st.plotly_chart(entry[0], **kwargs)
+
+
+def pyplot(name, key, draw, rows=None, width="stretch"):
+    """Shows the figure returned by ``draw()`` as a PNG rendered once per ``(name, key)``."""
+    cache = _cache()
+    with instrument.timed(name) as step:
+        entry = cache.get((name, key))
+        if entry is None:
+            fig = draw()
+            buffer = io.BytesIO()
+            try:
+                fig.savefig(buffer, **SAVEFIG)
+            finally:
+                plt.close(fig)
+            entry = _png(buffer)
+            cache.put((name, key), *entry)
+        else:
+            step.name = f"{name} (cached)"
+        step.rows, step.bytes = rows, entry[1]
+        return st.image(entry[0], width=width)
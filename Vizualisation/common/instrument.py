@@ -0,0 +1,183 @@
+"""Opt-in timing of data preparation and chart rendering.
+
+Set ``DASHBOARD_PROFILE=1`` before ``streamlit run`` to record, for every
+wrapped step, the elapsed time, the rows it handled and (for charts) the
+size of the payload sent to the browser. Records are written as JSON lines
+to the ``dashboards.profile`` logger and listed in a collapsible panel.
+
+When the variable is unset, ``timed`` returns a shared no-op object (used
+as a decorator, it hands the function back unwrapped) and the chart
+helpers call Streamlit directly, so the cost is one boolean test per
+call. Measuring payloads means serialising each figure a second time,
+which is only acceptable because it happens when profiling.
+
+Usage::
+
+    instrument.begin()                      # top of the script
+    with instrument.timed("tips: filter") as t:
+        df_filtered = ...
+        t.rows = len(df_filtered)
+    instrument.plotly_chart("tips: scatter", fig, rows=len(df_filtered))
+    instrument.panel()                      # bottom of the script
+
+Fragments are decorated with ``@instrument.section("uber")`` (below
+``@st.fragment``) so their reruns get their own panel.
+"""
+import io
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import streamlit as st
+
+ENV_VAR = "DASHBOARD_PROFILE"
+ENABLED = os.environ.get(ENV_VAR, "").lower() in ("1", "true", "yes", "on")
+
+PAGE = "page"
+_STATE_KEY = "_instrument"
+
+logger = logging.getLogger("dashboards.profile")
+if ENABLED and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+
+class _Timed:
+    """Context manager and decorator recording one step under ``name``."""
+
+    __slots__ = ("name", "rows", "bytes", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.bytes = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self._start, self.rows, self.bytes)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            rows = len(result) if hasattr(result, "__len__") else None
+            _record(self.name, time.perf_counter() - start, rows)
+            return result
+
+        return wrapper
+
+
+class _Off:
+    """Shared stand-in for ``_Timed`` when profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __call__(self, func):
+        return func
+
+
+_OFF = _Off()
+
+
+def _state():
+    return st.session_state.setdefault(_STATE_KEY, {"current": PAGE, "records": {}})
+
+
+def _record(name, seconds, rows=None, size=None):
+    state = _state()
+    record = {"section": state["current"], "name": name, "seconds": round(seconds, 4), "rows": rows, "bytes": size}
+    state["records"].setdefault(state["current"], []).append(record)
+    logger.info(json.dumps(record))
+
+
+def begin():
+    """Clears the page records; call once at the top of the script."""
+    if ENABLED:
+        state = _state()
+        state["current"] = PAGE
+        state["records"][PAGE] = []
+
+
+def timed(name):
+    """Context manager or decorator recording the wrapped step under ``name``.
+
+    Set ``rows`` (and ``bytes``) on the object returned by ``with``; as a
+    decorator, ``rows`` is the length of the return value when it has one.
+    """
+    return _Timed(name) if ENABLED else _OFF
+
+
+@contextmanager
+def section(name, label=None):
+    """Groups the records of a fragment and shows them in their own panel."""
+    if not ENABLED:
+        yield
+        return
+    state = _state()
+    previous, state["current"] = state["current"], name
+    state["records"][name] = []
+    try:
+        yield
+    finally:
+        state["current"] = previous
+        _show(state["records"][name], label or f"⏱ Timings: {name}", st)
+
+
+def plotly_chart(name, fig, rows=None, **kwargs):
+    """``st.plotly_chart`` timed, with the figure's JSON size as payload."""
+    if not ENABLED:
+        return st.plotly_chart(fig, **kwargs)
+    with _Timed(name) as timer:
+        timer.rows, timer.bytes = rows, len(fig.to_json())
+        return st.plotly_chart(fig, **kwargs)
+
+
+def pyplot(name, fig, rows=None, **kwargs):
+    """``st.pyplot`` timed, with the PNG size as payload."""
+    if not ENABLED:
+        return st.pyplot(fig, **kwargs)
+    with _Timed(name) as timer:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        timer.rows, timer.bytes = rows, buffer.tell()
+        return st.pyplot(fig, **kwargs)
+
+
+def pydeck_chart(name, deck, rows=None, **kwargs):
+    """``st.pydeck_chart`` timed, with the deck's JSON size as payload."""
+    if not ENABLED:
+        return st.pydeck_chart(deck, **kwargs)
+    with _Timed(name) as timer:
+        timer.rows, timer.bytes = rows, len(deck.to_json())
+        return st.pydeck_chart(deck, **kwargs)
+
+
+def _show(records, label, container):
+    if not records:
+        return
+    with container.expander(f"{label} ({sum(r['seconds'] for r in records):.2f}s)"):
+        st.dataframe(
+            [{k: r[k] for k in ("name", "seconds", "rows", "bytes")} for r in sorted(records, key=lambda r: -r["seconds"])],
+            hide_index=True,
+        )
+
+
+def panel():
+    """Shows the page records in the sidebar; call once at the bottom of the script."""
+    if ENABLED:
+        _show(_state()["records"].get(PAGE, []), "⏱ Timings", st.sidebar)
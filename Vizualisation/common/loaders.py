@@ -0,0 +1,117 @@
+"""Cached loaders shared by the Streamlit dashboards.
+
+Streamlit reruns the whole script on every interaction, so anything read
+from disk or the network is loaded through here:
+
+* frames and JSON go through ``st.cache_data`` with the file's mtime and size
+  in the key, so an edited file is picked up on the next rerun;
+* immutable objects (images, derived indexes) go through
+  ``st.cache_resource`` and are shared by every session of the process;
+* every cache is bounded by ``CACHE_TTL`` seconds and ``MAX_ENTRIES``;
+* ``clear_caches()`` drops everything, e.g. from a "Reload data" button.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+import requests
+import streamlit as st
+from PIL import Image
+
+from common.time_index import TripTimeIndex
+from common.tips_sketch import TipsSketch
+from common.uber_cube import TripCube
+from common.uber_months import load_months, store_version
+
+CACHE_TTL = 3600
+MAX_ENTRIES = 32
+
+
+def file_key(path):
+    """Cache key that changes whenever the file at ``path`` is modified."""
+    stat = Path(path).stat()
+    return str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_ENTRIES, show_spinner=False)
+def _read_csv(path, key, options):
+    return pd.read_csv(path, **dict(options))
+
+
+def load_csv(path, **options):
+    """``pd.read_csv`` cached on the file's mtime; keyword options must be hashable."""
+    return _read_csv(str(path), file_key(path), tuple(sorted(options.items())))
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_ENTRIES, show_spinner=False)
+def _read_json(path, key):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_json(path):
+    """Loads a JSON file (GeoJSON, Lottie animation...), cached on its mtime."""
+    return _read_json(str(path), file_key(path))
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_ENTRIES, show_spinner=False)
+def load_json_url(url):
+    """Fetches JSON from a URL, or returns None when the request fails."""
+    try:
+        r = requests.get(url, timeout=10)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=MAX_ENTRIES, show_spinner=False)
+def _open_image(path, key):
+    image = Image.open(path)
+    image.load()
+    return image
+
+
+def load_image(path):
+    """Decodes an image once per process and file version."""
+    return _open_image(str(path), file_key(path))
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8, show_spinner=False)
+def _load_uber_months(months, version):
+    return load_months(months=list(months))
+
+
+def load_uber_months(months):
+    """Selected months of the Uber store, cached on the store version.
+
+    At millions of rows, copying the frame out of ``st.cache_data`` on every
+    rerun would cost more than it saves, so it is shared as a resource: the
+    dashboards only ever slice it and must not modify it in place.
+    """
+    return _load_uber_months(tuple(months), store_version(months=months))
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8, show_spinner=False)
+def uber_cube(_df_uber, version):
+    """Count cube of the loaded months (built once per store version)."""
+    return TripCube.from_frame(_df_uber)
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8, show_spinner=False)
+def uber_time_index(_df_uber, version):
+    """Day/hour offset index of the loaded months (built once per store version)."""
+    return TripTimeIndex(_df_uber)
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8, show_spinner=False)
+def tips_sketch(_df_tips, version):
+    """Distribution sketch of the tips (built once per file version)."""
+    return TipsSketch.from_frame(_df_tips)
+
+
+def clear_caches():
+    """Forces every loader to re-read its source on the next call."""
+    st.cache_data.clear()
+    st.cache_resource.clear()
@@ -0,0 +1,68 @@
+"""Manifest, freshness and atomic-write helpers shared by the stores and caches.
+
+``uber_months`` and ``energy_store`` keep a ``manifest.json`` next to their
+Parquet files. It records the size and mtime of every source
+(``stat_entry``), so unchanged sources are not even opened, and the SHA-1
+of its content (``file_digest``), so a copy with a new mtime but the same
+bytes is not ingested again.
+
+Derived files (the geometry caches) get a ``.source.json`` sidecar holding
+the ``stat_entry`` of their source instead: ``is_fresh`` holds while it
+matches, so a source replaced by an older copy is still rebuilt.
+"""
+import hashlib
+import json
+import os
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-1 hex digest of a file, read in fixed-size chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stat_entry(path):
+    """Resolved path, size and mtime of ``path``, as stored in the manifests."""
+    stat = path.stat()
+    return {"path": str(path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_manifest(path):
+    """The JSON manifest at ``path``, or None when it is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest, path):
+    """Writes ``manifest`` to ``path`` atomically."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _sidecar(target):
+    return target.with_name(target.name + ".source.json")
+
+
+def is_fresh(target, source):
+    """Whether ``target`` was derived from ``source`` as it is now (size and mtime)."""
+    return target.exists() and read_manifest(_sidecar(target)) == stat_entry(source)
+
+
+def mark_fresh(target, source):
+    """Records ``source`` as it is now in ``target``'s sidecar; call after writing ``target``."""
+    write_manifest(stat_entry(source), _sidecar(target))
+
+
+def write_atomic(df, target):
+    """Writes ``df`` to the Parquet file ``target`` through a temporary file."""
+    tmp = target.with_name(target.name + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
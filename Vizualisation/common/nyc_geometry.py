@@ -0,0 +1,111 @@
+"""Prepared versions of the NYC borough geometries.
+
+``nyc.geojson`` (2.7 MB of text) was parsed at full vertex resolution both
+for the point-in-polygon pass and for the choropleth, and shipped whole to
+the browser. The two uses need different things, so each gets its own copy,
+derived once per version of the source file::
+
+    .cache/geometry/nyc.precise.parquet    names + WKB, full resolution
+    .cache/geometry/nyc.z10.geojson        display copy for zoom 10
+
+Each copy has a ``.source.json`` sidecar recording the size and mtime of
+the source it was derived from; any change to either, including a file
+replaced by an older one, rebuilds it.
+
+The precise copy feeds ``assign_boroughs``; WKB loads without any JSON or
+``shape()`` parsing. Display copies are simplified with
+``shapely.coverage_simplify``, which works on the shared edges of the
+boroughs, so neighbours stay gap- and overlap-free, to half a pixel at
+their zoom, and coordinates are rounded to that precision.
+
+    python -m common.nyc_geometry project/nyc.geojson --zoom 10 12
+"""
+import argparse
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import mapping
+
+from common.boroughs import load_borough_geometries
+from common.manifests import is_fresh, mark_fresh
+
+# The five boroughs fill a dashboard-sized map at about zoom 10.
+DISPLAY_ZOOM = 10
+TILE_SIZE = 256
+
+
+def _cache_dir(source, cache_dir):
+    cache_dir = Path(cache_dir) if cache_dir else source.parent / ".cache" / "geometry"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def zoom_tolerance(zoom):
+    """Half a screen pixel at ``zoom``, in degrees of longitude."""
+    return 360 / (TILE_SIZE * 2**zoom) / 2
+
+
+def precise_geometries(source, cache_dir=None):
+    """``(names, geometries)`` of ``source`` at full resolution, via the WKB cache."""
+    source = Path(source)
+    target = _cache_dir(source, cache_dir) / f"{source.stem}.precise.parquet"
+    if is_fresh(target, source):
+        table = pd.read_parquet(target)
+        return table["name"].tolist(), shapely.from_wkb(table["wkb"].to_numpy())
+    names, geometries = load_borough_geometries(source)
+    tmp = target.with_name(target.name + ".tmp")
+    pd.DataFrame({"name": names, "wkb": shapely.to_wkb(geometries)}).to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    mark_fresh(target, source)
+    return names, geometries
+
+
+def simplify_for_zoom(geojson, zoom):
+    """Coverage-simplifies every feature for display at ``zoom``; properties are kept."""
+    tolerance = zoom_tolerance(zoom)
+    decimals = max(0, math.ceil(-math.log10(tolerance)))
+    geometries = shapely.from_geojson([json.dumps(f["geometry"]) for f in geojson["features"]])
+    simple = shapely.coverage_simplify(geometries, tolerance)
+    simple = shapely.transform(simple, lambda coords: np.round(coords, decimals))
+    features = [
+        {"type": "Feature", "properties": feature["properties"], "geometry": mapping(geometry)}
+        for feature, geometry in zip(geojson["features"], simple)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def display_path(source, zoom=DISPLAY_ZOOM, cache_dir=None):
+    """Path of the display copy of ``source`` for ``zoom``, written if stale."""
+    source = Path(source)
+    target = _cache_dir(source, cache_dir) / f"{source.stem}.z{zoom}.geojson"
+    if not is_fresh(target, source):
+        with open(source, "r") as f:
+            simple = simplify_for_zoom(json.load(f), zoom)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(simple, f, separators=(",", ":"))
+        os.replace(tmp, target)
+        mark_fresh(target, source)
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare precise and display copies of a borough GeoJSON.")
+    parser.add_argument("source", help="borough GeoJSON")
+    parser.add_argument("--zoom", type=int, nargs="+", default=[DISPLAY_ZOOM], help="display zoom levels")
+    parser.add_argument("--cache-dir", default=None, help="defaults to .cache/geometry next to the source")
+    args = parser.parse_args(argv)
+    names, _ = precise_geometries(args.source, args.cache_dir)
+    print(f"{len(names)} features, precise copy cached")
+    for zoom in args.zoom:
+        path = display_path(args.source, zoom, args.cache_dir)
+        print(f"zoom {zoom}: {path} ({path.stat().st_size / 1e3:.0f} kB)")
+
+
+if __name__ == "__main__":
+    main()
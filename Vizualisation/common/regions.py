@@ -0,0 +1,147 @@
+"""French region geometries for the energy dashboard.
+
+``elec.py`` used to read the regions GeoJSON from france-geojson.gregoiredavid.fr
+at start-up and pass the same URL to two choropleths, so every rerun
+downloaded it once server-side and twice more in the browser (and the page
+failed outright without outbound network). Here the regions come from a
+vendored copy next to the dashboard, simplified to dashboard resolution,
+with each feature's centroid, and cached under ``.cache``. The dashboard
+never downloads anything: without a vendored copy ``load_regions`` returns
+None and ``region_centroids`` falls back to ``REGION_CENTROIDS``, so the
+maps can still place the regions.
+
+To vendor the file from a machine with network access::
+
+    python -m common.regions --output Elec/regions.geojson
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+from shapely.geometry import mapping, shape
+
+from common.manifests import is_fresh, mark_fresh
+
+REGIONS_URL = "https://france-geojson.gregoiredavid.fr/repo/regions.geojson"
+VENDORED_NAME = "regions.geojson"
+CACHE_PATH = Path(".cache") / "regions.simplified.geojson"
+
+# ~1 km: invisible at the zoom of a whole-country choropleth.
+DEFAULT_TOLERANCE = 0.01
+COORD_DECIMALS = 4
+
+# code -> (longitude, latitude): approximate geographic centre of each region,
+# used when no GeoJSON is available.
+REGION_CENTROIDS = {
+    1: (-61.55, 16.20),  # Guadeloupe
+    2: (-61.02, 14.64),  # Martinique
+    3: (-53.13, 3.93),  # Guyane
+    4: (55.53, -21.12),  # La Réunion
+    6: (45.15, -12.82),  # Mayotte
+    11: (2.50, 48.71),  # Île-de-France
+    24: (1.73, 47.48),  # Centre-Val de Loire
+    27: (4.81, 47.24),  # Bourgogne-Franche-Comté
+    28: (0.11, 49.12),  # Normandie
+    32: (2.77, 49.97),  # Hauts-de-France
+    44: (5.61, 48.69),  # Grand Est
+    52: (-0.82, 47.47),  # Pays de la Loire
+    53: (-2.84, 48.18),  # Bretagne
+    75: (0.20, 45.19),  # Nouvelle-Aquitaine
+    76: (2.14, 43.70),  # Occitanie
+    84: (4.54, 45.45),  # Auvergne-Rhône-Alpes
+    93: (6.06, 43.96),  # Provence-Alpes-Côte d'Azur
+    94: (9.10, 42.15),  # Corse
+}
+
+
+def read_geojson(source):
+    """Reads a GeoJSON from a local path or an http(s) URL."""
+    if str(source).startswith(("http://", "https://")):
+        r = requests.get(str(source), timeout=30)
+        r.raise_for_status()
+        return r.json()
+    with open(source, "r") as f:
+        return json.load(f)
+
+
+def simplify_regions(geojson, tolerance=DEFAULT_TOLERANCE):
+    """Simplifies every feature and stores its centroid in the properties.
+
+    Centroids are taken on the full-resolution geometry, before simplifying.
+    """
+    features = []
+    for feature in geojson["features"]:
+        geometry = shape(feature["geometry"])
+        centroid = geometry.centroid
+        simple = geometry.simplify(tolerance, preserve_topology=True)
+        simple = shapely.transform(simple, lambda coords: np.round(coords, COORD_DECIMALS))
+        properties = dict(feature["properties"], longitude=centroid.x, latitude=centroid.y)
+        features.append({"type": "Feature", "properties": properties, "geometry": mapping(simple)})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def prepare_regions(source, target, tolerance=DEFAULT_TOLERANCE):
+    """Reads ``source``, simplifies it and writes the result to ``target``."""
+    regions = simplify_regions(read_geojson(source), tolerance)
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, "w") as f:
+        json.dump(regions, f, separators=(",", ":"))
+    return regions
+
+
+def load_regions(vendored=VENDORED_NAME, cache_path=CACHE_PATH):
+    """Returns the simplified regions, or None when there are none on disk.
+
+    The vendored file is prepared into ``cache_path`` on first use, and again
+    whenever its size or mtime differs from the copy the cache was made from
+    (see ``manifests.is_fresh``). Nothing is ever downloaded.
+    """
+    vendored, cache_path = Path(vendored), Path(cache_path)
+    if cache_path.exists() and (not vendored.exists() or is_fresh(cache_path, vendored)):
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    if not vendored.exists():
+        return None
+    regions = prepare_regions(vendored, cache_path)
+    mark_fresh(cache_path, vendored)
+    return regions
+
+
+def region_centroids(regions=None):
+    """``code``/``longitude``/``latitude`` of every region, as a frame.
+
+    Without ``regions``, the positions come from ``REGION_CENTROIDS``.
+    """
+    if regions is None:
+        return pd.DataFrame(
+            [{"code": code, "longitude": lon, "latitude": lat} for code, (lon, lat) in REGION_CENTROIDS.items()]
+        )
+    return pd.DataFrame(
+        [
+            {
+                "code": int(feature["properties"]["code"]),
+                "longitude": feature["properties"]["longitude"],
+                "latitude": feature["properties"]["latitude"],
+            }
+            for feature in regions["features"]
+        ]
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download and simplify the French regions GeoJSON.")
+    parser.add_argument("--source", default=REGIONS_URL, help="URL or path of the full-resolution GeoJSON")
+    parser.add_argument("--output", default=VENDORED_NAME, help="where to write the simplified GeoJSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="simplification tolerance in degrees")
+    args = parser.parse_args(argv)
+    regions = prepare_regions(args.source, args.output, args.tolerance)
+    print(f"{len(regions['features'])} regions -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Lazy tabs for the Streamlit dashboards.
+
+``st.tabs`` runs every tab body on each rerun, so moving a Tips radio button
+also rebuilt the Uber maps and the animated borough choropleth. With tab
+state tracking on, switching tabs reruns the script and each container
+reports ``.open``; guarding a body with ``if tab.open:`` means only the
+selected tab executes, while the loaders and figure helpers stay cached for
+when the user comes back.
+
+Streamlit drops the value of a widget that is not rendered during a run, so
+filters inside a hidden tab would reset. ``lazy_tabs`` carries the values of
+the widget keys listed in ``keep`` over while their tab is closed.
+"""
+import streamlit as st
+
+
+def lazy_tabs(labels, key, keep=None):
+    """``st.tabs`` where only the selected container is ``.open``.
+
+    ``keep`` maps a tab label to the keys of the widgets it contains.
+    """
+    tabs = st.tabs(labels, key=key, on_change="rerun")
+    for tab, label in zip(tabs, labels):
+        if tab.open:
+            continue
+        for widget_key in (keep or {}).get(label, ()):
+            if widget_key in st.session_state:
+                st.session_state[widget_key] = st.session_state[widget_key]
+    return tabs
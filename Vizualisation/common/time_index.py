@@ -0,0 +1,50 @@
+"""Offset index over the (day, hour)-sorted Uber trips.
+
+The ingest cache stores the trips sorted by day then hour, so every
+``(day, hour)`` cell is a contiguous run of rows. ``TripTimeIndex`` records
+where each run starts and resolves the day/hour sliders into row slices with
+``searchsorted`` instead of building full-length boolean masks.
+"""
+import numpy as np
+
+HOURS_PER_DAY = 24
+MAX_DAY = 31
+
+
+class TripTimeIndex:
+    """Row offsets of each (day, hour) cell in a day/hour-sorted frame."""
+
+    def __init__(self, df):
+        keys = df["day"].to_numpy(np.int16) * HOURS_PER_DAY + df["hour"].to_numpy(np.int16)
+        if len(keys) and np.any(np.diff(keys) < 0):
+            raise ValueError("frame must be sorted by day then hour")
+        cells = np.arange((MAX_DAY + 1) * HOURS_PER_DAY + 1)
+        self.offsets = np.searchsorted(keys, cells, side="left")
+
+    def _bounds(self, day_range, hour_range):
+        """Start/stop row offsets of the run of each selected day."""
+        days = np.arange(day_range[0], day_range[1] + 1)
+        starts = self.offsets[days * HOURS_PER_DAY + hour_range[0]]
+        stops = self.offsets[days * HOURS_PER_DAY + hour_range[1] + 1]
+        return starts, stops
+
+    def positions(self, day_range, hour_range):
+        """Row positions matching inclusive day and hour ranges."""
+        starts, stops = self._bounds(day_range, hour_range)
+        return np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)])
+
+    def filter(self, df, day_range, hour_range, bases=None):
+        """Rows of ``df`` within the ranges, optionally restricted to ``bases``.
+
+        With the full hour range the selected days form a single slice, which
+        is returned without gathering rows. The base filter only looks at the
+        rows inside the time selection.
+        """
+        if tuple(hour_range) == (0, HOURS_PER_DAY - 1):
+            starts, stops = self._bounds(day_range, hour_range)
+            selected = df.iloc[starts[0]:stops[-1]]
+        else:
+            selected = df.iloc[self.positions(day_range, hour_range)]
+        if bases is not None:
+            selected = selected[selected["Base"].isin(bases)]
+        return selected
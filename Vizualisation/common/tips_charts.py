@@ -0,0 +1,230 @@
+"""Large-data versions of the Tips charts.
+
+The Tips tab hands every filtered row to ``px.scatter``,
+``px.violin(points="all")``, ``px.scatter_3d``, and to seaborn's boxplots
+and ``regplot``. That suits the 244 rows of ``tips.csv``. Point-of-sale
+exports with the same columns have millions of rows, though, and each of
+those rows would end up in the browser or in a matplotlib artist. Above
+``LARGE_ROWS`` rows, the tab switches to:
+
+* ``stratified_sample`` for point layers. It keeps a fixed share of every
+  (day, sex, smoker) stratum, and picks rows by a hash of their index, so
+  the same filters always show the same points;
+* ``density_heatmap``, a 2-D histogram binned in NumPy, in place of the
+  raw scatter;
+* ``summary_violin``, ``summary_boxplot``, ``summary_histogram`` and
+  ``summary_histplot``. They draw from the quantiles, KDEs and bins of a
+  ``TipsSketch`` selection (see ``common/tips_sketch.py``), which covers
+  every row, and only the sampled points are overlaid;
+* ``summary_regplot``, which fits the line from the sketch's regression
+  sums with an analytic band, instead of refitting and bootstrapping.
+"""
+import numpy as np
+import pandas as pd
+import plotly.colors
+import plotly.graph_objects as go
+import seaborn as sns
+from matplotlib.patches import Patch
+
+from common.tips_sketch import REGRESSION, ols_fit
+
+# Above this many rows the Tips charts switch to samples and summaries.
+LARGE_ROWS = 20_000
+POINT_SAMPLE = 5_000
+STRATA = ["day", "sex", "smoker"]
+DENSITY_BINS = 80
+
+
+def stratified_sample(df, n=POINT_SAMPLE, by=STRATA):
+    """About ``n`` rows of ``df``, each stratum of ``by`` kept in proportion.
+
+    Every non-empty stratum keeps at least one row. Within a stratum, rows
+    are taken in the order of a hash of their index, so the sample does not
+    change between reruns.
+    """
+    if len(df) <= n:
+        return df
+    strata = df.groupby(by, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    counts = np.bincount(strata)
+    quota = np.maximum(1, counts * n // len(df))
+    keys = pd.util.hash_pandas_object(df.index, index=False).to_numpy()
+    order = np.lexsort((keys, strata))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(order)) - starts[strata[order]]
+    return df.iloc[np.sort(order[rank < quota[strata[order]]])]
+
+
+def density_heatmap(df, x, y, title=None, bins=DENSITY_BINS):
+    """2-D histogram of ``x`` against ``y``; only the bin counts reach the browser."""
+    counts, x_edges, y_edges = np.histogram2d(df[x], df[y], bins=bins)
+    z = np.where(counts > 0, counts, np.nan).T
+    fig = go.Figure(
+        go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=z,
+            colorscale="Viridis",
+            colorbar=dict(title="rows"),
+            hovertemplate=f"{x}=%{{x:.2f}}<br>{y}=%{{y:.2f}}<br>rows=%{{z}}<extra></extra>",
+        )
+    )
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def summary_violin(sketch, x, color, measure, points=None, title=None, width=0.8):
+    """Violins of ``measure`` per ``x`` and ``color``, with box, from a ``TipsSketch``.
+
+    ``points``, when given, is overlaid as jittered markers (typically a
+    ``stratified_sample`` of the filtered rows).
+    """
+    x_levels, colors = sketch.present(x), sketch.present(color)
+    grid, densities = sketch.kde(measure, by=[x, color])
+    boxes = sketch.box_stats(measure, by=[x, color])
+    palette = plotly.colors.qualitative.Plotly
+    slot = width / max(len(colors), 1)
+    fig = go.Figure()
+    for j, level in enumerate(colors):
+        rgb = palette[j % len(palette)]
+        legend = True
+        for i, category in enumerate(x_levels):
+            if (category, level) not in boxes:
+                continue
+            center = i - width / 2 + slot * (j + 0.5)
+            density = densities[(category, level)]
+            half = density / density.max() * slot * 0.45
+            # Trim the empty tails of the shared grid
+            shown = density > density.max() * 1e-3
+            stats = boxes[(category, level)]
+            fig.add_trace(
+                go.Scatter(
+                    x=np.concatenate([center - half[shown], (center + half[shown])[::-1]]),
+                    y=np.concatenate([grid[shown], grid[shown][::-1]]),
+                    fill="toself",
+                    line=dict(color=rgb, width=1),
+                    mode="lines",
+                    name=str(level),
+                    legendgroup=str(level),
+                    showlegend=legend,
+                    hoverinfo="skip",
+                )
+            )
+            legend = False
+            fig.add_trace(
+                go.Box(
+                    x=[center],
+                    q1=[stats["q1"]],
+                    median=[stats["med"]],
+                    q3=[stats["q3"]],
+                    lowerfence=[stats["whislo"]],
+                    upperfence=[stats["whishi"]],
+                    width=slot * 0.15,
+                    marker_color=rgb,
+                    legendgroup=str(level),
+                    showlegend=False,
+                    name=f"{category}, {level}",
+                )
+            )
+        if points is not None:
+            sample = points[points[color] == level]
+            positions = sample[x].map({c: k for k, c in enumerate(x_levels)}).to_numpy(dtype=float)
+            jitter = (pd.util.hash_pandas_object(sample.index, index=False).to_numpy() % 1000 / 1000 - 0.5) * slot * 0.6
+            fig.add_trace(
+                go.Scattergl(
+                    x=positions - width / 2 + slot * (j + 0.5) + jitter,
+                    y=sample[measure],
+                    mode="markers",
+                    marker=dict(color=rgb, size=3, opacity=0.4),
+                    legendgroup=str(level),
+                    showlegend=False,
+                    hoverinfo="skip",
+                )
+            )
+    fig.update_layout(
+        title=title,
+        legend_title_text=color,
+        xaxis=dict(title=x, tickmode="array", tickvals=list(range(len(x_levels))), ticktext=[str(c) for c in x_levels]),
+        yaxis_title=measure,
+    )
+    return fig
+
+
+def summary_boxplot(ax, sketch, x, measure, hue=None, width=0.8):
+    """``sns.boxplot`` look-alike drawn with ``Axes.bxp`` from a ``TipsSketch``."""
+    x_levels = sketch.present(x)
+    hues = sketch.present(hue) if hue else [None]
+    boxes = sketch.box_stats(measure, by=[x, hue] if hue else [x])
+    palette = sns.color_palette(n_colors=len(hues))
+    slot = width / max(len(hues), 1)
+    for j, level in enumerate(hues):
+        stats, positions = [], []
+        for i, category in enumerate(x_levels):
+            key = (category, level) if hue else (category,)
+            if key in boxes:
+                stats.append(boxes[key])
+                positions.append(i - width / 2 + slot * (j + 0.5))
+        ax.bxp(
+            stats,
+            positions=positions,
+            widths=slot * 0.9,
+            patch_artist=True,
+            boxprops=dict(facecolor=palette[j]),
+            medianprops=dict(color="0.2"),
+            flierprops=dict(marker="d", markersize=4, markerfacecolor="0.2"),
+        )
+    ax.set_xticks(range(len(x_levels)), [str(c) for c in x_levels])
+    ax.set_xlabel(x)
+    ax.set_ylabel(measure)
+    if hue is not None:
+        ax.legend(
+            handles=[Patch(facecolor=palette[j], label=str(level)) for j, level in enumerate(hues)],
+            title=hue,
+        )
+    return ax
+
+
+def summary_histogram(sketch, measure, bins=20, title=None):
+    """``px.histogram(nbins=bins)`` look-alike from a ``TipsSketch``."""
+    edges, counts = sketch.histogram(measure, bins)
+    fig = go.Figure(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            hovertemplate=f"{measure}=%{{x:.2f}}<br>count=%{{y}}<extra></extra>",
+        )
+    )
+    fig.update_layout(title=title, xaxis_title=measure, yaxis_title="count", bargap=0)
+    return fig
+
+
+def summary_histplot(ax, sketch, measure, bins=40):
+    """``sns.histplot(kde=True)`` look-alike from a ``TipsSketch``."""
+    edges, counts = sketch.histogram(measure, bins)
+    color = sns.color_palette()[0]
+    ax.stairs(counts, edges, fill=True, alpha=0.5, color=color)
+    ax.stairs(counts, edges, color=color)
+    grid, densities = sketch.kde(measure, points=512)
+    if densities:
+        # Scale the density to counts per bin, like seaborn does
+        inside = (grid >= edges[0]) & (grid <= edges[-1])
+        ax.plot(grid[inside], densities[()][inside] * counts.sum() * (edges[1] - edges[0]), color=color)
+    ax.set_xlabel(measure)
+    ax.set_ylabel("Count")
+    return ax
+
+
+def summary_regplot(ax, sketch, points, level=0.95):
+    """``sns.regplot`` look-alike: ``points`` scattered, line and band from the sketch."""
+    x, y = REGRESSION
+    color = sns.color_palette()[0]
+    ax.scatter(points[x], points[y], color=color, alpha=0.8, s=15)
+    sums = sketch.regression().get(())
+    if sums is not None and len(points):
+        grid = np.linspace(points[x].min(), points[x].max(), 100)
+        fit = ols_fit(sums, grid, level)
+        ax.plot(grid, fit["fitted"], color=color)
+        ax.fill_between(grid, fit["lower"], fit["upper"], color=color, alpha=0.15, linewidth=0)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    return ax
@@ -0,0 +1,219 @@
+"""Mergeable distribution sketches for the Tips charts.
+
+The boxplots, violins and histograms of the Tips tab each re-scanned and
+re-sorted the filtered rows on every rerun. ``TipsSketch`` reads the rows
+once and keeps, for every (day, sex, smoker, size) cell and every measure
+(``tip`` and ``tip_percentage``):
+
+* a histogram over ``FINE_BINS`` equal-width bins that span the measure's
+  whole range. Tips are rounded to the cent, so the bins are about as
+  fine as the data itself;
+* the moments ``(n, sum, sum of squares)``;
+* the sufficient statistics of the ``tip ~ total_bill`` regression,
+  ``(n, sum x, sum y, sum xy, sum x², sum y²)``.
+
+All of them are additive. Filtering is therefore a slice of the cell axes, and a
+chart group (say, day x sex) is a sum over the other axes. Quantiles,
+whiskers, outliers, coarse histograms and KDEs are then read off the
+merged bins, and the cost does not depend on the number of rows. Quantiles
+are exact to within one fine bin. The regression line and its confidence
+band come from the merged sums (``ols_fit``), with no refit or bootstrap.
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import t as student_t
+
+DIMENSIONS = ["day", "sex", "smoker", "size"]
+MEASURES = ["tip", "tip_percentage"]
+FINE_BINS = 4000
+KDE_POINTS = 128
+MAX_FLIERS = 200
+# (x, y) of the regression chart
+REGRESSION = ("total_bill", "tip")
+
+
+def measure_values(df, measure):
+    """Values of ``measure``; ``tip_percentage`` is derived like in the Tips tab."""
+    if measure == "tip_percentage":
+        return df["tip"] / df["total_bill"] * 100
+    return df[measure]
+
+
+class TipsSketch:
+    """Fine histograms and moments indexed by ``[day, sex, smoker, size]``."""
+
+    def __init__(self, counts, moments, sums, edges, levels):
+        self.counts = counts  # measure -> int64 [day, sex, smoker, size, bin]
+        self.moments = moments  # measure -> float [day, sex, smoker, size, (n, sum, sum of squares)]
+        self.sums = sums  # float [day, sex, smoker, size, (n, Σx, Σy, Σxy, Σx², Σy²)] of REGRESSION
+        self.edges = edges  # measure -> FINE_BINS + 1 bin edges
+        self.levels = levels  # dimension -> levels, in display order
+
+    @classmethod
+    def from_frame(cls, df, bins=FINE_BINS):
+        """Builds the sketch from a frame with the ``tips.csv`` columns."""
+        codes, levels = [], {}
+        for dimension in DIMENSIONS:
+            categorical = pd.Categorical(df[dimension])
+            levels[dimension] = np.asarray(categorical.categories)
+            codes.append(categorical.codes.astype(np.int64))
+        shape = tuple(len(levels[d]) for d in DIMENSIONS)
+        known = np.logical_and.reduce([c >= 0 for c in codes])
+        cells = np.ravel_multi_index([c[known] for c in codes], shape)
+        n_cells = int(np.prod(shape))
+
+        counts, moments, edges = {}, {}, {}
+        for measure in MEASURES:
+            values = measure_values(df, measure).to_numpy(np.float64)[known]
+            ok = np.isfinite(values)
+            cell, values = cells[ok], values[ok]
+            lo, hi = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+            edges[measure] = np.linspace(lo, hi if hi > lo else lo + 1.0, bins + 1)
+            position = (values - lo) / (edges[measure][-1] - lo) * bins
+            index = np.clip(position.astype(np.int64), 0, bins - 1)
+            counts[measure] = np.bincount(cell * bins + index, minlength=n_cells * bins).reshape(shape + (bins,))
+            moments[measure] = np.stack(
+                [np.bincount(cell, weights=w, minlength=n_cells) for w in (None, values, values**2)], axis=-1
+            ).reshape(shape + (3,))
+        x, y = (df[c].to_numpy(np.float64)[known] for c in REGRESSION)
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y, cell = x[ok], y[ok], cells[ok]
+        sums = np.stack(
+            [np.bincount(cell, weights=w, minlength=n_cells) for w in (None, x, y, x * y, x**2, y**2)], axis=-1
+        ).reshape(shape + (6,))
+        return cls(counts, moments, sums, edges, levels)
+
+    def select(self, days=None, sexes=None, smokers=None, sizes=None):
+        """Sub-sketch for the given levels of each dimension (``None`` keeps all)."""
+        counts, moments, sums, levels = dict(self.counts), dict(self.moments), self.sums, dict(self.levels)
+        for axis, (dimension, chosen) in enumerate(zip(DIMENSIONS, (days, sexes, smokers, sizes))):
+            if chosen is None:
+                continue
+            mask = np.isin(levels[dimension], list(chosen))
+            levels[dimension] = levels[dimension][mask]
+            counts = {m: c.compress(mask, axis=axis) for m, c in counts.items()}
+            moments = {m: s.compress(mask, axis=axis) for m, s in moments.items()}
+            sums = sums.compress(mask, axis=axis)
+        return TipsSketch(counts, moments, sums, self.edges, levels)
+
+    def total(self):
+        return int(self.moments[MEASURES[0]][..., 0].sum())
+
+    def present(self, dimension):
+        """Levels of ``dimension`` with at least one row in the selection."""
+        axis = DIMENSIONS.index(dimension)
+        n = self.moments[MEASURES[0]][..., 0]
+        rows = n.sum(axis=tuple(a for a in range(n.ndim) if a != axis))
+        return list(self.levels[dimension][rows > 0])
+
+    def _merged(self, array, by):
+        """``{key: array summed over the dimensions not in by}`` for non-empty groups."""
+        axes = [DIMENSIONS.index(d) for d in by]
+        summed = array.sum(axis=tuple(a for a in range(len(DIMENSIONS)) if a not in axes))
+        summed = np.moveaxis(summed, list(range(len(axes))), np.argsort(axes))
+        groups = {}
+        for index in np.ndindex(summed.shape[: len(axes)]):
+            if summed[index].any():
+                groups[tuple(self.levels[d][i] for d, i in zip(by, index))] = summed[index]
+        return groups
+
+    def histograms(self, measure, by=()):
+        """Fine histogram of ``measure`` per group of ``by``."""
+        return self._merged(self.counts[measure], list(by))
+
+    def box_stats(self, measure, by=()):
+        """Quartiles, 1.5 IQR whiskers and (thinned) outliers per group, in ``Axes.bxp`` form."""
+        edges = self.edges[measure]
+        centers = (edges[:-1] + edges[1:]) / 2
+        moments = self._merged(self.moments[measure], list(by))
+        stats = {}
+        for key, counts in self.histograms(measure, by).items():
+            q1, med, q3 = _quantiles(counts, edges, [0.25, 0.5, 0.75])
+            low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            occupied = centers[counts > 0]
+            inside = occupied[(occupied >= low) & (occupied <= high)]
+            fliers = occupied[(occupied < low) | (occupied > high)]
+            if len(fliers) > MAX_FLIERS:
+                fliers = fliers[np.linspace(0, len(fliers) - 1, MAX_FLIERS).astype(int)]
+            n, total, _ = moments[key]
+            stats[key] = {
+                "q1": q1,
+                "med": med,
+                "q3": q3,
+                "whislo": inside.min() if len(inside) else q1,
+                "whishi": inside.max() if len(inside) else q3,
+                "fliers": fliers,
+                "mean": total / n,
+            }
+        return stats
+
+    def kde(self, measure, by=(), points=KDE_POINTS):
+        """``(grid, {key: density})``: Gaussian KDE per group, Silverman's bandwidth.
+
+        The fine histogram is convolved with the kernel, then read at
+        ``points`` positions spanning the measure's range.
+        """
+        edges = self.edges[measure]
+        centers = (edges[:-1] + edges[1:]) / 2
+        step = edges[1] - edges[0]
+        grid = np.linspace(edges[0], edges[-1], points)
+        moments = self._merged(self.moments[measure], list(by))
+        densities = {}
+        for key, counts in self.histograms(measure, by).items():
+            n, total, squares = moments[key]
+            std = np.sqrt(max(squares / n - (total / n) ** 2, 0.0))
+            bandwidth = max(1.06 * std * n**-0.2, step)
+            half = int(np.ceil(4 * bandwidth / step))
+            kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * step / bandwidth) ** 2)
+            density = np.convolve(counts, kernel)[half : half + len(counts)] / (n * bandwidth * np.sqrt(2 * np.pi))
+            densities[key] = np.interp(grid, centers, density)
+        return grid, densities
+
+    def histogram(self, measure, bins=20):
+        """``(edges, counts)`` of ``measure`` over the selection, in ``bins`` equal bins."""
+        counts = sum(self.histograms(measure).values(), np.zeros(FINE_BINS, dtype=np.int64))
+        edges = self.edges[measure]
+        occupied = np.flatnonzero(counts)
+        if not len(occupied):
+            return np.linspace(edges[0], edges[-1], bins + 1), np.zeros(bins, dtype=np.int64)
+        lo, hi = edges[occupied[0]], edges[occupied[-1] + 1]
+        centers = (edges[:-1] + edges[1:]) / 2
+        coarse, coarse_edges = np.histogram(centers, bins=bins, range=(lo, hi), weights=counts)
+        return coarse_edges, coarse.astype(np.int64)
+
+    def regression(self, by=()):
+        """Sufficient statistics of ``REGRESSION`` per group of ``by``."""
+        return self._merged(self.sums, list(by))
+
+
+def ols_fit(sums, x, level=0.95):
+    """Least-squares line from ``(n, Σx, Σy, Σxy, Σx², Σy²)`` and its band at ``x``.
+
+    The band is the analytic ``level`` confidence interval of the mean
+    response, ``ŷ ± t * s * sqrt(1/n + (x - x̄)² / Sxx)``. Returns a dict with
+    ``slope``, ``intercept``, ``r``, ``fitted``, ``lower`` and ``upper``.
+    """
+    n, sx, sy, sxy, sxx, syy = sums
+    x = np.asarray(x, dtype=float)
+    mean_x = sx / n
+    s_xx, s_xy, s_yy = sxx - sx * sx / n, sxy - sx * sy / n, syy - sy * sy / n
+    slope = s_xy / s_xx if s_xx > 0 else 0.0
+    intercept = (sy - slope * sx) / n
+    fitted = intercept + slope * x
+    if n > 2 and s_xx > 0:
+        residual = max(s_yy - slope * s_xy, 0.0) / (n - 2)
+        half = student_t.ppf(0.5 + level / 2, n - 2) * np.sqrt(residual * (1 / n + (x - mean_x) ** 2 / s_xx))
+    else:
+        half = np.full_like(x, np.nan)
+    r = s_xy / np.sqrt(s_xx * s_yy) if s_xx > 0 and s_yy > 0 else np.nan
+    return {"slope": slope, "intercept": intercept, "r": r, "fitted": fitted, "lower": fitted - half, "upper": fitted + half}
+
+
+def _quantiles(counts, edges, qs):
+    """Quantiles of binned data, interpolating linearly inside the bin."""
+    cumulative = np.cumsum(counts)
+    ranks = np.asarray(qs) * cumulative[-1]
+    k = np.minimum(np.searchsorted(cumulative, ranks, side="left"), len(counts) - 1)
+    before = cumulative[k] - counts[k]
+    fraction = np.where(counts[k] > 0, (ranks - before) / np.maximum(counts[k], 1), 0.5)
+    return edges[k] + fraction * (edges[k + 1] - edges[k])
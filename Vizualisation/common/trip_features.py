@@ -0,0 +1,49 @@
+"""Vectorized calendar features for trip timestamps.
+
+Replaces the per-row ``.map(lambda dt: dt.day)`` style helpers: every feature
+is derived from the raw ``datetime64`` buffer with NumPy integer arithmetic,
+in one pass over the data, and stored as ``int8``.
+"""
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86_400
+SECONDS_PER_HOUR = 3_600
+
+# 1970-01-01 was a Thursday; Monday=0 to match ``datetime.weekday()``.
+_EPOCH_WEEKDAY = 3
+
+CALENDAR_COLUMNS = ("day", "weekday", "hour", "month")
+
+
+def calendar_features(timestamps):
+    """Returns ``{"day", "weekday", "hour", "month"}`` as int8 arrays.
+
+    ``timestamps`` is anything convertible to ``datetime64`` (a Series, an
+    Index or an array). Values must be timezone-naive and not NaT.
+    """
+    ts = np.asarray(timestamps, dtype="datetime64[s]")
+    seconds = ts.view(np.int64)
+
+    days = np.floor_divide(seconds, SECONDS_PER_DAY)
+    hour = (seconds - days * SECONDS_PER_DAY) // SECONDS_PER_HOUR
+    weekday = (days + _EPOCH_WEEKDAY) % 7
+
+    months = ts.astype("datetime64[M]")
+    month = months.view(np.int64) % 12 + 1
+    day = days - months.astype("datetime64[D]").view(np.int64) + 1
+
+    return {
+        "day": day.astype(np.int8),
+        "weekday": weekday.astype(np.int8),
+        "hour": hour.astype(np.int8),
+        "month": month.astype(np.int8),
+    }
+
+
+def add_calendar_features(df, column="Date/Time"):
+    """Adds the calendar columns of ``df[column]`` to ``df`` in place."""
+    features = calendar_features(df[column])
+    for name in CALENDAR_COLUMNS:
+        df[name] = pd.Series(features[name], index=df.index)
+    return df
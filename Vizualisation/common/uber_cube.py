@@ -0,0 +1,81 @@
+"""Pre-aggregated trip counts for the Uber tab.
+
+The hour/weekday histograms, the base pie and the weekday x hour pivot only
+need counts, so instead of masking the row-level frame on every slider move
+they are answered from a dense ``day x hour x weekday x Base`` count cube
+(31 * 24 * 7 * n_bases cells). Selecting a filter state is an array slice
+and every chart is a sum over the remaining axes.
+"""
+import numpy as np
+import pandas as pd
+
+DAYS = np.arange(1, 32)
+HOURS = np.arange(24)
+WEEKDAYS = np.arange(7)
+
+
+class TripCube:
+    """Ride counts indexed by ``[day, hour, weekday, base]``."""
+
+    def __init__(self, counts, days, hours, bases):
+        self.counts = counts
+        self.days = days
+        self.hours = hours
+        self.bases = bases
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds the cube from a frame with day/hour/weekday/Base columns."""
+        base = pd.Categorical(df["Base"])
+        bases = np.asarray(base.categories, dtype=object)
+        shape = (len(DAYS), len(HOURS), len(WEEKDAYS), len(bases))
+
+        flat = np.ravel_multi_index(
+            (
+                df["day"].to_numpy(np.int64) - 1,
+                df["hour"].to_numpy(np.int64),
+                df["weekday"].to_numpy(np.int64),
+                base.codes.astype(np.int64),
+            ),
+            shape,
+        )
+        counts = np.bincount(flat, minlength=np.prod(shape)).reshape(shape)
+        return cls(counts, DAYS, HOURS, bases)
+
+    def select(self, day_range=None, hour_range=None, bases=None):
+        """Returns the sub-cube for inclusive day/hour ranges and a base list."""
+        day_mask = _range_mask(self.days, day_range)
+        hour_mask = _range_mask(self.hours, hour_range)
+        base_mask = np.ones(len(self.bases), dtype=bool) if bases is None else np.isin(self.bases, list(bases))
+        counts = self.counts[day_mask][:, hour_mask][:, :, :, base_mask]
+        return TripCube(counts, self.days[day_mask], self.hours[hour_mask], self.bases[base_mask])
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def by_hour(self):
+        return pd.Series(self.counts.sum(axis=(0, 2, 3)), index=pd.Index(self.hours, name="hour"))
+
+    def by_weekday(self):
+        return pd.Series(self.counts.sum(axis=(0, 1, 3)), index=pd.Index(WEEKDAYS, name="weekday"))
+
+    def by_base(self):
+        """Counts per base, largest first (like ``value_counts``)."""
+        counts = pd.Series(self.counts.sum(axis=(0, 1, 2)), index=pd.Index(self.bases, name="Base"))
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def weekday_hour(self):
+        """Weekday x hour pivot; weekdays absent from the selection are dropped."""
+        pivot = pd.DataFrame(
+            self.counts.sum(axis=(0, 3)).T,
+            index=pd.Index(WEEKDAYS, name="weekday"),
+            columns=pd.Index(self.hours, name="hour"),
+        )
+        return pivot[pivot.sum(axis=1) > 0]
+
+
+def _range_mask(values, bounds):
+    if bounds is None:
+        return np.ones(len(values), dtype=bool)
+    low, high = bounds
+    return (values >= low) & (values <= high)
@@ -0,0 +1,197 @@
+"""Month-partitioned store for several Uber trip extracts.
+
+The 2014 series is one CSV per month (Apr-Sep, ~4.5M rows each), too much to
+hold as object-dtype pandas. ``ingest_months`` streams each CSV with
+``chunksize``, converts every chunk to compact dtypes and appends it to a
+Parquet store partitioned by month::
+
+    .cache/uber_months/
+        manifest.json
+        month=2014-04/uber-raw-data-apr14.parquet
+        month=2014-05/uber-raw-data-may14.parquet
+
+Each partition file is sorted by day then hour (see ``TripTimeIndex``).
+``load_months`` reads back only the months the dashboard selected. The
+paths given to ``ingest_months`` are the whole series: partitions of a
+source that is no longer among them are deleted.
+
+    python -m common.uber_months project/uber*.csv --store project/.cache/uber_months
+"""
+import argparse
+import glob
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.boroughs import assign_boroughs
+from common.manifests import file_digest, read_manifest, stat_entry, write_atomic, write_manifest
+from common.nyc_geometry import precise_geometries
+from common.trip_features import add_calendar_features
+from common.uber_store import DATETIME_FORMAT, INGEST_VERSION, RAW_DTYPES, UBER_SCHEMA, apply_schema
+
+DEFAULT_STORE = Path(".cache") / "uber_months"
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def _compact_chunk(chunk, geometries):
+    """Parses dates and adds the int8 calendar and borough columns to a chunk."""
+    chunk["Date/Time"] = pd.to_datetime(chunk["Date/Time"], format=DATETIME_FORMAT)
+    chunk = add_calendar_features(chunk)
+    if geometries is not None:
+        chunk["borough_id"] = assign_boroughs(chunk["Lon"].to_numpy(), chunk["Lat"].to_numpy(), geometries)
+    # Base stays a plain string until the month is assembled, so that every
+    # part shares one set of categories.
+    return apply_schema(chunk, {c: t for c, t in UBER_SCHEMA.items() if c != "Base"})
+
+
+def _month_dir(store_dir, month):
+    return store_dir / f"month={month}"
+
+
+def _source_of(part):
+    """Source stem of a partition file or of a hidden spool part."""
+    return part.stem[1:].rsplit("-", 1)[0] if part.name.startswith(".") else part.stem
+
+
+def _remove_source(store_dir, stem):
+    """Deletes the partitions of ``stem``, and the spool parts of an interrupted ingest."""
+    for old in store_dir.glob(f"month=*/{glob.escape(stem)}.parquet"):
+        old.unlink()
+    for part in store_dir.glob(f"month=*/.{glob.escape(stem)}-*.parquet"):
+        # Not the spool of a source whose own stem is ``{stem}-...``
+        if _source_of(part) == stem:
+            part.unlink()
+
+
+def _ingest_source(source, store_dir, chunksize, geometries):
+    """Streams one CSV into the store and returns the months it covers.
+
+    Chunks are spooled as hidden per-month part files; once the CSV is
+    consumed each month is sorted and rewritten as a single file, so memory
+    is bounded by one month of compact rows, never by the raw text.
+    """
+    _remove_source(store_dir, source.stem)
+
+    spool = {}
+    reader = pd.read_csv(source, delimiter=",", dtype=RAW_DTYPES, chunksize=chunksize)
+    for i, chunk in enumerate(reader):
+        chunk = _compact_chunk(chunk, geometries)
+        stamp = chunk["Date/Time"].dt
+        keys = stamp.year.to_numpy() * 100 + stamp.month.to_numpy()
+        for key in np.unique(keys):
+            month = f"{key // 100:04d}-{key % 100:02d}"
+            month_dir = _month_dir(store_dir, month)
+            month_dir.mkdir(parents=True, exist_ok=True)
+            part = month_dir / f".{source.stem}-{i}.parquet"
+            chunk[keys == key].to_parquet(part, index=False)
+            spool.setdefault(month, []).append(part)
+
+    for month, parts in spool.items():
+        df = apply_schema(pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True))
+        df = df.sort_values(["day", "hour"], kind="stable", ignore_index=True)
+        write_atomic(df, _month_dir(store_dir, month) / f"{source.stem}.parquet")
+        for p in parts:
+            p.unlink()
+    return sorted(spool)
+
+
+def ingest_months(paths, store_dir=DEFAULT_STORE, boroughs_path=None, chunksize=DEFAULT_CHUNKSIZE, force=False):
+    """Brings the month store up to date with the given CSV files.
+
+    Sources whose size and mtime match the manifest are skipped; a change of
+    borough file or of ``INGEST_VERSION`` rebuilds every source. Partitions
+    whose source is not in ``paths`` are removed.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_dir / "manifest.json"
+    boroughs = stat_entry(Path(boroughs_path)) if boroughs_path is not None else None
+
+    manifest = read_manifest(manifest_path)
+    if force or manifest is None or manifest.get("version") != INGEST_VERSION or manifest.get("boroughs") != boroughs:
+        manifest = {"version": INGEST_VERSION, "boroughs": boroughs, "sources": {}}
+
+    geometries = None
+    for path in map(Path, paths):
+        stat = stat_entry(path)
+        entry = manifest["sources"].get(path.stem)
+        if entry is not None and entry["inputs"] == stat:
+            continue
+        digest = file_digest(path)
+        if entry is None or entry["sha1"] != digest:
+            if geometries is None and boroughs_path is not None:
+                _, geometries = precise_geometries(boroughs_path)
+            months = _ingest_source(path, store_dir, chunksize, geometries)
+        else:
+            months = entry["months"]
+        manifest["sources"][path.stem] = {"inputs": stat, "sha1": digest, "months": months}
+        write_manifest(manifest, manifest_path)
+
+    stems = {Path(p).stem for p in paths}
+    removed = [stem for stem in manifest["sources"] if stem not in stems]
+    for stem in removed:
+        del manifest["sources"][stem]
+    if removed:
+        write_manifest(manifest, manifest_path)
+    # Files of sources that left the manifest (removed CSVs, or a rebuild)
+    for part in store_dir.glob("month=*/*.parquet"):
+        if _source_of(part) not in manifest["sources"]:
+            part.unlink()
+    for month_dir in store_dir.glob("month=*"):
+        if not any(month_dir.iterdir()):
+            month_dir.rmdir()
+    return manifest
+
+
+def available_months(store_dir=DEFAULT_STORE):
+    """Lists the ``YYYY-MM`` partitions present in the store."""
+    return sorted(p.name.split("=", 1)[1] for p in Path(store_dir).glob("month=*") if any(p.glob("[!.]*.parquet")))
+
+
+def store_version(store_dir=DEFAULT_STORE, months=None):
+    """Short key identifying the selected months' data, for use in cache keys."""
+    manifest = read_manifest(Path(store_dir) / "manifest.json") or {}
+    sources = sorted((name, entry["sha1"]) for name, entry in manifest.get("sources", {}).items())
+    key = json.dumps([manifest.get("version"), manifest.get("boroughs"), sources, sorted(months or [])])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def load_months(store_dir=DEFAULT_STORE, months=None, columns=None):
+    """Loads the selected months (all by default), sorted by day then hour."""
+    store_dir = Path(store_dir)
+    months = available_months(store_dir) if months is None else months
+    files = [f for month in months for f in sorted(_month_dir(store_dir, month).glob("[!.]*.parquet"))]
+    if not files:
+        raise ValueError(f"no Uber data in {store_dir} for months {list(months)}")
+
+    frames = [apply_schema(pd.read_parquet(f, columns=columns)) for f in files]
+    if len(frames) == 1:
+        return frames[0]
+    if "Base" in frames[0]:
+        bases = pd.api.types.union_categoricals([f["Base"] for f in frames]).categories
+        for frame in frames:
+            frame["Base"] = frame["Base"].cat.set_categories(bases)
+    df = pd.concat(frames, ignore_index=True)
+    if {"day", "hour"} <= set(df.columns):
+        df = df.sort_values(["day", "hour"], kind="stable", ignore_index=True)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream monthly Uber CSVs into the month-partitioned store.")
+    parser.add_argument("paths", nargs="+", help="raw Uber CSV files, one or more months each")
+    parser.add_argument("--store", default=str(DEFAULT_STORE), help="store directory")
+    parser.add_argument("--boroughs", default=None, help="GeoJSON used to add borough_id")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--force", action="store_true", help="rebuild every source")
+    args = parser.parse_args(argv)
+    manifest = ingest_months(args.paths, args.store, args.boroughs, args.chunksize, args.force)
+    for name, entry in sorted(manifest["sources"].items()):
+        print(f"{name}: {', '.join(entry['months'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Schema of the compact Uber trip frame.
+
+Trips are stored and loaded with the dtypes declared in ``UBER_SCHEMA``
+(see ``common/uber_months.py`` for the month-partitioned store);
+``apply_schema`` casts a frame to them and ``memory_report`` shows what
+each column costs.
+"""
+import pandas as pd
+
+DATETIME_FORMAT = "%m/%d/%Y %H:%M:%S"
+
+# Bump when the layout of the stored frame changes so old stores are rebuilt.
+INGEST_VERSION = 5
+
+# Declared dtypes of the Uber frame. With the 8-byte Date/Time and the int8
+# borough_id a trip takes about 22 bytes (see ``memory_report``) instead of
+# ~90 with object Base strings and int64 calendar columns.
+UBER_SCHEMA = {
+    "Lat": "float32",
+    "Lon": "float32",
+    "Base": "category",
+    "day": "int8",
+    "weekday": "int8",
+    "hour": "int8",
+    "month": "int8",
+}
+
+# Columns that ``read_csv`` can parse straight into their final dtype.
+RAW_DTYPES = {col: UBER_SCHEMA[col] for col in ("Lat", "Lon")}
+
+
+def apply_schema(df, schema=UBER_SCHEMA):
+    """Casts the columns of ``df`` present in ``schema`` that differ from it."""
+    casts = {col: dtype for col, dtype in schema.items() if col in df and str(df[col].dtype) != dtype}
+    return df.astype(casts) if casts else df
+
+
+def memory_report(df):
+    """Per-column dtype and memory footprint, with a total row."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame(
+        {
+            "dtype": df.dtypes.astype(str),
+            "MB": usage / 1e6,
+            "bytes/row": usage / max(len(df), 1),
+        }
+    )
+    report.loc["total"] = ["", report["MB"].sum(), report["bytes/row"].sum()]
+    return report.round(2)
@@ -4,15 +4,23 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pydeck as pdk
-from PIL import Image
 import missingno as msno
 import plotly.express as px
 import plotly.graph_objects as go
 from streamlit_lottie import st_lottie
-import requests
-import json
-import geopandas as gpd
 import geopy.distance
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import loaders
+from common.binning import RAW_POINT_LIMIT, add_column_style, hex_bins, radius_for_zoom
+from common.boroughs import borough_names, rides_matrix
+from common.choropleth import animated_choropleth
+from common.nyc_geometry import display_path
+from common.sections import lazy_tabs
+from common.uber_months import available_months, ingest_months, store_version
+from common.uber_store import memory_report
 
 # --- Configuration de la Page Streamlit ---
 st.set_page_config(
@@ -25,49 +33,56 @@ st.set_page_config(
 def count_rows(rows):
     return len(rows)
 
-def load_lottiefile(filepath: str):
-    """Charge une animation Lottie depuis un fichier local."""
-    with open(filepath, "r") as f:
-        return json.load(f)
-    
 def show_data_preview(df, title):
     st.write(f"**Aperçu des données ({title}) :**")
     st.dataframe(df.head())  # Affiche les 5 premières lignes
 
-# Charger les animations Lottie 
-lottie_taxi = load_lottiefile("taxi.json")
-lottie_data = load_lottiefile("data.json") 
+@st.cache_data(max_entries=64)
+def uber_map_bins(_df_filtre, version, jour_filtre, heure_filtre, zoom):
+    """Agrège les points filtrés en hexagones (cache par jeu de données, filtres et zoom)."""
+    return hex_bins(_df_filtre["Lon"], _df_filtre["Lat"], radius_for_zoom(zoom))
 
 
-# --- Chargement et Prétraitement des Données ---
+@st.cache_resource(ttl=loaders.CACHE_TTL, max_entries=8)
+def animation_arrondissements(_df_uber, version, _geojson):
+    """Carte choroplèthe animée des arrondissements, construite une fois par version des données."""
+    names = borough_names(_geojson)
+    dates, counts = rides_matrix(_df_uber, len(names))
+    return animated_choropleth(_geojson, names, dates, counts, "Nombre de Courses", "Évolution des Courses Uber à New York par Arrondissement")
 
-df_uber = pd.read_csv('uber.csv', delimiter=",")
-df_uber['Date/Time'] = pd.to_datetime(df_uber['Date/Time'], format='%m/%d/%Y %H:%M:%S')
-df_uber["day"] = df_uber["Date/Time"].map(lambda dt: dt.day)
-df_uber["weekday"] = df_uber["Date/Time"].map(lambda dt: dt.weekday())
-df_uber["hour"] = df_uber["Date/Time"].map(lambda dt: dt.hour)
-df_uber["month"] = df_uber["Date/Time"].map(lambda dt: dt.month)  # Ajout du mois
+# Charger les animations Lottie (tous les chargements sont en cache, voir common/loaders.py)
+lottie_taxi = loaders.load_json("taxi.json")
+lottie_data = loaders.load_json("data.json") 
 
-df_tips = pd.read_csv("tips.csv")
-df_tips["day"] = df_tips["day"].astype("category")
-df_tips["time"] = df_tips["time"].astype("category")
 
+# --- Chargement et Prétraitement des Données ---
 
-# Charger le fichier GeoJSON
-@st.cache_data
-def load_geojson(filepath):
-    with open(filepath, "r") as f:
-        return json.load(f)
+# Tous les uber*.csv du dossier sont convertis une fois en un stock Parquet
+# partitionné par mois (.cache/uber_months, colonnes day/weekday/hour/month et
+# borough_id incluses) ; seuls les mois choisis sont chargés
+ingest_months(sorted(Path(".").glob("uber*.csv")), boroughs_path="nyc.geojson")
+mois_disponibles = available_months()
+mois_filtre = st.sidebar.multiselect(
+    "Mois :", mois_disponibles, default=mois_disponibles[-1:]
+) or mois_disponibles[-1:]
+uber_version = store_version(months=mois_filtre)
+df_uber = loaders.load_uber_months(mois_filtre)  # partagé, jamais modifié en place
+uber_cube = loaders.uber_cube(df_uber, uber_version)  # comptages jour x heure x jour de semaine x base
+uber_index = loaders.uber_time_index(df_uber, uber_version)  # lignes triées par (jour, heure)
+
+df_tips = loaders.load_csv("tips.csv")
+df_tips["day"] = df_tips["day"].astype("category")
+df_tips["time"] = df_tips["time"].astype("category")
 
-nyc_geojson = load_geojson("nyc.geojson")
 
-# Charger le shapefile ou GeoJSON précis de New York (remplacez par le chemin correct)
-nyc_boroughs = gpd.read_file("nyc.geojson") # ou nyc_boroughs.geojson
+# Charger le fichier GeoJSON : copie simplifiée pour la carte de la ville entière,
+# préparée une fois dans .cache/geometry (voir common/nyc_geometry.py)
+nyc_geojson = loaders.load_json(display_path("nyc.geojson"))
 
 # --- Images ---
-uber_logo = Image.open('Uber.png')  
-my_pic = Image.open('CV.jpg')
-efrei_logo = Image.open('efrei.png') 
+uber_logo = loaders.load_image('Uber.png')  
+my_pic = loaders.load_image('CV.jpg')
+efrei_logo = loaders.load_image('efrei.png') 
 
 # --- Sidebar ---
 with st.sidebar:
@@ -75,6 +90,11 @@ with st.sidebar:
     st.image(efrei_logo, width=200)
     st.title("Data Explorer") 
 
+    # Vider les caches pour relire immédiatement les fichiers modifiés
+    if st.button("Recharger les données 🔄"):
+        loaders.clear_caches()
+        st.rerun()
+
     # Section À propos (utilisez st.expander pour la réduire par défaut)
     with st.expander("À propos de Samuel BIENVENU 👋"): 
         st.image(my_pic, use_column_width=True) # Assurez-vous que l'image s'adapte à la sidebar
@@ -113,73 +133,65 @@ with st.sidebar:
     )
 
 
-# --- Tabs ---
-onglet_accueil, onglet_uber, onglet_pourboires, onglet_avance = st.tabs(
-    ["Accueil 🏠", "Analyse Uber 🚕", "Analyse des Pourboires 🍽️", "Visualisations Avancées ✨"]
-)
-
-# --- Page d'accueil ---
-with onglet_accueil:
-    st.title("Dashboard d'Analyse de Données 📊")  # Titre plus descriptif
-
-    # Logo Uber centré avec une meilleure présentation
-    st.image(uber_logo, width=200)
-
+# --- Panneaux de filtres ---
+# Chaque panneau est un fragment : modifier un de ses filtres ne réexécute que ce panneau,
+# ni le chargement des données ni les autres onglets. Les données sont passées en arguments.
 
-    st.markdown(
-        """
-        <div style="text-align: center; margin-bottom: 20px;">
-            <h2 style="color:#00A0E9;font-family:Arial;font-size: 20px; font-weight: bold"> Exploration des données Uber et des pourboires de restaurants</h2>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-
-    st.markdown("""
-    Ce dashboard interactif vous permet d'explorer les données Uber et les pourboires de restaurants de manière approfondie.  
-    Découvrez les visualisations et analyses ci-dessous :
-    """)
-
-    st.markdown("""
-    **Fonctionnalités clés :**
-    * **Analyse des courses Uber :**
-        * Visualisation de la fréquence des courses par jour, heure, jour de la semaine et base Uber.
-        * Carte interactive et animée montrant l'évolution des courses Uber à New York par arrondissement.
-    * **Analyse des pourboires :**
-        * Visualisations interactives des pourboires en fonction de la facture totale, du jour de la semaine, du sexe et de l'habitude de fumer.
-        * Exploration des relations entre ces variables grâce à un tableau croisé dynamique.
-    """)
-
-# --- Page Analyse Uber ---
-with onglet_uber:
-    st.title("Analyse des Données Uber 🚕")
-    show_data_preview(df_uber, "Uber") #Aperçu des données brutes
 
+@st.fragment
+def panneau_uber(df_uber, uber_cube, uber_index, uber_version):
+    """Filtres Uber et graphiques qui en dépendent."""
     # --- Filtres ---
     col1, col2 = st.columns(2)
     with col1:
-        jour_filtre = st.slider("Jour du mois:", 1, 30, (1, 30))
+        jour_filtre = st.slider("Jour du mois:", 1, 31, (1, 31), key="jour_filtre")
     with col2:
-        heure_filtre = st.slider("Heure de la journée:", 0, 23, (0, 23))
+        heure_filtre = st.slider("Heure de la journée:", 0, 23, (0, 23), key="heure_filtre")
 
     # --- Appliquer les filtres ---
-    df_uber_filtree = df_uber[
-        (df_uber["day"] >= jour_filtre[0]) & (df_uber["day"] <= jour_filtre[1]) &
-        (df_uber["hour"] >= heure_filtre[0]) & (df_uber["hour"] <= heure_filtre[1])
-    ]
+    df_uber_filtree = uber_index.filter(df_uber, jour_filtre, heure_filtre)
+    # Les graphiques de comptage sont calculés à partir du cube
+    uber_comptes = uber_cube.select(jour_filtre, heure_filtre)
 
     # --- Visualisations ---
     st.header("Visualisations des Courses Uber")
 
     # --- Graphique 1: Histogramme des courses par heure ---
-    fig_heure = px.histogram(
-        df_uber_filtree, x="hour", title="Nombre de courses par heure"
+    courses_par_heure = uber_comptes.by_hour()
+    fig_heure = px.bar(
+        x=courses_par_heure.index, y=courses_par_heure.values,
+        labels={"x": "hour", "y": "count"}, title="Nombre de courses par heure"
     )
     st.plotly_chart(fig_heure)
 
     # --- Graphique 2: Carte 3D des points de dépose ---
     st.subheader("Carte 3D des points de dépose")
     midpoint = (np.average(df_uber_filtree["Lat"]), np.average(df_uber_filtree["Lon"]))
+    # Au-delà de RAW_POINT_LIMIT points, on envoie des hexagones pré-agrégés
+    if len(df_uber_filtree) > RAW_POINT_LIMIT:
+        hex_layer = pdk.Layer(
+            "ColumnLayer",
+            add_column_style(uber_map_bins(df_uber_filtree, uber_version, jour_filtre, heure_filtre, 11)),
+            get_position=["lon", "lat"],
+            get_elevation="elevation",
+            get_fill_color="color",
+            radius=radius_for_zoom(11),
+            disk_resolution=6,
+            elevation_scale=4,
+            pickable=True,
+            extruded=True,
+        )
+    else:
+        hex_layer = pdk.Layer(
+            "HexagonLayer",
+            df_uber_filtree[["Lon", "Lat"]].rename(columns={"Lon": "lon", "Lat": "lat"}),
+            get_position=["lon", "lat"],
+            radius=200,
+            elevation_scale=4,
+            elevation_range=[0, 1000],
+            pickable=True,
+            extruded=True,
+        )
     st.pydeck_chart(pdk.Deck(
         map_style="mapbox://styles/mapbox/dark-v10",
         initial_view_state=pdk.ViewState(
@@ -188,24 +200,19 @@ with onglet_uber:
             zoom=11,
             pitch=50,
         ),
-        layers=[
-            pdk.Layer(
-                "HexagonLayer",
-                df_uber_filtree[["Lon", "Lat"]].rename(columns={"Lon": "lon", "Lat": "lat"}),
-                get_position=["lon", "lat"],
-                radius=200,
-                elevation_scale=4,
-                elevation_range=[0, 1000],
-                pickable=True,
-                extruded=True,
-            ),
-        ],
+        layers=[hex_layer],
     ))
 
     # Nouveau Graphique 3:  Heatmap des courses Uber
     st.subheader("Heatmap des courses Uber")
+    if len(df_uber_filtree) > RAW_POINT_LIMIT:
+        heat_data = uber_map_bins(df_uber_filtree, uber_version, jour_filtre, heure_filtre, 10)
+        heat_poids = "count"
+    else:
+        heat_data = df_uber_filtree.rename(columns={"Lon": "lon", "Lat": "lat"})
+        heat_poids = None
     fig_heatmap = px.density_mapbox(
-    df_uber_filtree, lat="Lat", lon="Lon", radius=10,  # Supprimer z="hour"
+    heat_data, lat="lat", lon="lon", z=heat_poids, radius=10,
     center=dict(lat=40.7128, lon=-74.0060), zoom=10,
     mapbox_style="carto-positron", title="Densité des courses Uber"
     )
@@ -213,7 +220,7 @@ with onglet_uber:
 
     # 4. Diagramme circulaire des différentes bases Uber
     st.subheader("Proportion des trajets par base Uber")
-    base_counts = df_uber_filtree["Base"].value_counts()
+    base_counts = uber_comptes.by_base()
     fig_pie = px.pie(
         values=base_counts.values, 
         names=base_counts.index, 
@@ -224,28 +231,29 @@ with onglet_uber:
 
     # 5. Tableau croisé dynamique du nombre de trajets par jour et heure
     st.subheader("Nombre de trajets par jour et heure")
-    df_pivot = df_uber_filtree.groupby(["weekday", "hour"]).size().unstack()
+    df_pivot = uber_comptes.weekday_hour()
     st.dataframe(df_pivot) # Affiche le tableau croisé dynamique
 
     # Nouveau graphique : Histogramme du nombre de trajets par jour de la semaine
     st.subheader("Nombre de trajets par jour de la semaine")
-    fig_weekday = px.histogram(df_uber_filtree, x='weekday', title="Nombre de trajets par jour de la semaine", nbins=7)
+    courses_par_jour = uber_comptes.by_weekday()
+    fig_weekday = px.bar(x=courses_par_jour.index, y=courses_par_jour.values,
+                         labels={"x": "weekday", "y": "count"}, title="Nombre de trajets par jour de la semaine")
     st.plotly_chart(fig_weekday)
 
-# --- Page Analyse des Pourboires ---
-with onglet_pourboires:
-    st.title("Analyse des Données de Pourboires 🍽️")
-    show_data_preview(df_tips, "Tips") #Aperçu des données brutes
 
+@st.fragment
+def panneau_pourboires(df_tips):
+    """Filtres des pourboires et graphiques qui en dépendent."""
     # --- Filtres ---
     col1, col2, col3 = st.columns(3)
     with col1:
-        jour_filtre_tips = st.multiselect("Jour de la semaine:", df_tips["day"].unique(), default=df_tips["day"].unique())
+        jour_filtre_tips = st.multiselect("Jour de la semaine:", df_tips["day"].unique(), default=df_tips["day"].unique(), key="jour_filtre_tips")
     with col2:
-        fumeur_filtre = st.radio("Fumeur :", ["All", "Yes", "No"], index=0)
+        fumeur_filtre = st.radio("Fumeur :", ["All", "Yes", "No"], index=0, key="fumeur_filtre")
     with col3:
         # Utiliser st.radio pour le filtre "Sexe" avec une option "All"
-        sexe_filtre = st.radio("Sexe :", ["All", "Male", "Female"], index=0)
+        sexe_filtre = st.radio("Sexe :", ["All", "Male", "Female"], index=0, key="sexe_filtre")
 
     # --- Appliquer les filtres ---
     df_tips_filtree = df_tips[df_tips["day"].isin(jour_filtre_tips)]
@@ -317,90 +325,106 @@ with onglet_pourboires:
     ax.set_title("Distribution des pourboires en pourcentage")
     st.pyplot(fig_hist_pourcentage)
 
-# --- Page Visualisations Avancées ---
-with onglet_avance:
-    st.title("Plongeons dans des Visualisations Époustouflantes! 🚀")
-
-    # --- Exemple 1: Graphique 3D interactif avec Plotly ---
-    st.header("1. Nuage de points 3D : Relation Facture-Pourboire-Jour")
-
-    fig = px.scatter_3d(
-        df_tips, 
-        x="total_bill", 
-        y="tip", 
-        z="day", 
-        color="sex", 
-        size="size",
-        title="Relation 3D entre Facture, Pourboire et Jour",
-        labels={"total_bill": "Facture Totale", "tip": "Pourboire", "day": "Jour", "sex": "Sexe"},
-    )
-    st.plotly_chart(fig, use_container_width=True)
 
-    # --- Exemple 2: Carte Choroplèthe Animée (New York) ---
-    st.header("2. Carte Choroplèthe Animée : Évolution des Courses Uber à New York par Arrondissement")
+# --- Tabs ---
+# Seul l'onglet sélectionné est exécuté ; les filtres des onglets masqués gardent leur valeur
+ONGLETS = ["Accueil 🏠", "Analyse Uber 🚕", "Analyse des Pourboires 🍽️", "Visualisations Avancées ✨"]
+onglet_accueil, onglet_uber, onglet_pourboires, onglet_avance = lazy_tabs(
+    ONGLETS,
+    key="onglet",
+    keep={
+        ONGLETS[1]: ["jour_filtre", "heure_filtre"],
+        ONGLETS[2]: ["jour_filtre_tips", "fumeur_filtre", "sexe_filtre"],
+    },
+)
 
-    # Préparation des données pour la carte (CORRECTION)
-    df_uber_geo = gpd.GeoDataFrame(
-    df_uber,
-    geometry=gpd.points_from_xy(df_uber.Lon, df_uber.Lat),
-    crs="EPSG:4326"
-    )
+# --- Page d'accueil ---
+if onglet_accueil.open:
+    with onglet_accueil:
+        st.title("Dashboard d'Analyse de Données 📊")  # Titre plus descriptif
+
+        # Logo Uber centré avec une meilleure présentation
+        st.image(uber_logo, width=200)
+
+
+        st.markdown(
+            """
+            <div style="text-align: center; margin-bottom: 20px;">
+                <h2 style="color:#00A0E9;font-family:Arial;font-size: 20px; font-weight: bold"> Exploration des données Uber et des pourboires de restaurants</h2>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        st.markdown("""
+        Ce dashboard interactif vous permet d'explorer les données Uber et les pourboires de restaurants de manière approfondie.  
+        Découvrez les visualisations et analyses ci-dessous :
+        """)
+
+        st.markdown("""
+        **Fonctionnalités clés :**
+        * **Analyse des courses Uber :**
+            * Visualisation de la fréquence des courses par jour, heure, jour de la semaine et base Uber.
+            * Carte interactive et animée montrant l'évolution des courses Uber à New York par arrondissement.
+        * **Analyse des pourboires :**
+            * Visualisations interactives des pourboires en fonction de la facture totale, du jour de la semaine, du sexe et de l'habitude de fumer.
+            * Exploration des relations entre ces variables grâce à un tableau croisé dynamique.
+        """)
 
-    # Jointure spatiale (spatial join)
-    df_joined = gpd.sjoin(df_uber_geo, nyc_boroughs, how="left", predicate="intersects")
-
-    # Grouper les données
-    df_joined['Date'] = pd.to_datetime(df_joined['Date/Time']).dt.date
-    df_grouped = df_joined.groupby(["Date", "name"]).size().reset_index(name="Nombre de Courses")
-
-    # Création de la carte choroplèthe
-    fig_choro_ny = px.choropleth(
-        df_grouped,
-        geojson=nyc_geojson,
-        locations="name",  # utiliser 'name' car c'est le nom dans le GeoJSON
-        featureidkey="properties.name",
-        color="Nombre de Courses",
-        animation_frame="Date",
-        color_continuous_scale="Viridis",
-        range_color=(0, df_grouped["Nombre de Courses"].max()),
-        title="Évolution des Courses Uber à New York par Arrondissement",
-        hover_data=["Nombre de Courses"],
-        scope="north america",
-    )
+# --- Page Analyse Uber ---
+if onglet_uber.open:
+    with onglet_uber:
+        st.title("Analyse des Données Uber 🚕")
+        show_data_preview(df_uber, "Uber") #Aperçu des données brutes
+        with st.expander("Mémoire utilisée par colonne"):
+            st.dataframe(memory_report(df_uber))
 
-    # Amélioration de l'apparence et projection
-    fig_choro_ny.update_geos(
-        center=dict(lon=-74.0060, lat=40.7128),
-        fitbounds="locations",
-        projection=dict(type="albers usa", parallels=[30, 40]),
-    )
-    fig_choro_ny.update_layout(
-        geo=dict(
-            showland=True,
-            landcolor="rgb(217, 217, 217)",
-            countrycolor="white"
-        ),
-        margin={"r": 0, "t": 0, "l": 0, "b": 0},
-    )
+        panneau_uber(df_uber, uber_cube, uber_index, uber_version)
 
-    # Ajouter un slider pour sélectionner la date
-    dates_uniques = df_grouped["Date"].unique()
-    fig_choro_ny.update_layout(
-        sliders=[{"steps": [{"args": [["Date", date]], "label": date.strftime("%Y-%m-%d"), "method": "animate",}
-                             for date in dates_uniques],
-                 }],
-    )
+# --- Page Analyse des Pourboires ---
+if onglet_pourboires.open:
+    with onglet_pourboires:
+        st.title("Analyse des Données de Pourboires 🍽️")
+        show_data_preview(df_tips, "Tips") #Aperçu des données brutes
+
+        panneau_pourboires(df_tips)
+
+# --- Page Visualisations Avancées ---
+if onglet_avance.open:
+    with onglet_avance:
+        st.title("Plongeons dans des Visualisations Époustouflantes! 🚀")
 
-    st.plotly_chart(fig_choro_ny, use_container_width=True)
+        # --- Exemple 1: Graphique 3D interactif avec Plotly ---
+        st.header("1. Nuage de points 3D : Relation Facture-Pourboire-Jour")
 
+        fig = px.scatter_3d(
+            df_tips, 
+            x="total_bill", 
+            y="tip", 
+            z="day", 
+            color="sex", 
+            size="size",
+            title="Relation 3D entre Facture, Pourboire et Jour",
+            labels={"total_bill": "Facture Totale", "tip": "Pourboire", "day": "Jour", "sex": "Sexe"},
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-    # --- Exemple 3: Graphique Sunburst Interactif ---
-    st.header("3. Graphique Sunburst : Ventilation des Pourboires")
+        # --- Exemple 2: Carte Choroplèthe Animée (New York) ---
+        st.header("2. Carte Choroplèthe Animée : Évolution des Courses Uber à New York par Arrondissement")
+
+        # Construite une fois par version des données : une seule trace porte la géométrie, les frames ne portent que les comptages du jour
+        fig_choro_ny = animation_arrondissements(df_uber, uber_version, nyc_geojson)
+
+        st.plotly_chart(fig_choro_ny, use_container_width=True)
+
+
+        # --- Exemple 3: Graphique Sunburst Interactif ---
+        st.header("3. Graphique Sunburst : Ventilation des Pourboires")
     
-    fig_sunburst = px.sunburst(
-        df_tips, 
-        path=['day', 'sex', 'time'],
-        values='tip',
-        title='Ventilation des Pourboires par Jour, Sexe et Moment'
-    )
-    st.plotly_chart(fig_sunburst)
+        fig_sunburst = px.sunburst(
+            df_tips, 
+            path=['day', 'sex', 'time'],
+            values='tip',
+            title='Ventilation des Pourboires par Jour, Sexe et Moment'
+        )
+        st.plotly_chart(fig_sunburst)
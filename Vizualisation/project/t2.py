@@ -4,13 +4,32 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pydeck as pdk
-from PIL import Image
 import plotly.express as px
 from streamlit_lottie import st_lottie
-import requests
-import json
-import geopandas as gpd
 import time  # For progress bar
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import figure_cache, instrument, loaders
+from common.binning import RAW_POINT_LIMIT, add_column_style, hex_bins, radius_for_zoom
+from common.boroughs import borough_names, rides_matrix
+from common.choropleth import animated_choropleth
+from common.exports import download_buttons
+from common.nyc_geometry import display_path
+from common.sections import lazy_tabs
+from common.tips_charts import (
+    LARGE_ROWS,
+    density_heatmap,
+    stratified_sample,
+    summary_boxplot,
+    summary_histogram,
+    summary_histplot,
+    summary_regplot,
+    summary_violin,
+)
+from common.uber_months import available_months, ingest_months, store_version
+from common.uber_store import memory_report
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -18,6 +37,8 @@ st.set_page_config(
     page_icon=":bar_chart:",
     layout="wide",
 )
+# Per-chart timings, only when DASHBOARD_PROFILE is set (see common/instrument.py)
+instrument.begin()
 
 # --- Utility Functions ---
 
@@ -27,67 +48,66 @@ def count_rows(rows):
     return len(rows)
 
 
-def load_lottiefile(filepath: str):
-    """Loads a Lottie animation from a local file."""
-    with open(filepath, "r") as f:
-        return json.load(f)
-
-
-def load_lottieurl(url: str):
-    """Loads a Lottie animation from a URL."""
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-
 def show_data_preview(df, title):
     """Displays a preview of the DataFrame with a title."""
     st.write(f"**Data Preview ({title}):**")
     st.dataframe(df.head())
 
 
-# Load Lottie animations
-lottie_taxi = load_lottiefile("taxi.json")
-lottie_data = load_lottieurl(
+@st.cache_data(max_entries=64)
+def uber_map_bins(_df_filtered, version, day_filter, hour_filter, base_filter, zoom):
+    """Hex-bins the filtered pickups, cached per dataset, filter state and zoom."""
+    return hex_bins(_df_filtered["Lon"], _df_filtered["Lat"], radius_for_zoom(zoom))
+
+
+@st.cache_resource(ttl=loaders.CACHE_TTL, max_entries=8)
+def borough_animation(_df_uber, version, _geojson):
+    """Animated borough choropleth, built once per dataset version."""
+    names = borough_names(_geojson)
+    dates, counts = rides_matrix(_df_uber, len(names))
+    return animated_choropleth(_geojson, names, dates, counts, "Number of Rides", "Evolution of Uber Rides in New York by Borough")
+
+
+# Load Lottie animations (all loaders below are cached, see common/loaders.py)
+lottie_taxi = loaders.load_json("taxi.json")
+lottie_data = loaders.load_json_url(
     "https://assets8.lottiefiles.com/packages/lf20_ydo1amjm.json"
 )
 
 # --- Data Loading and Preprocessing ---
 
-# Uber dataset
-df_uber = pd.read_csv("uber.csv", delimiter=",")
-df_uber["Date/Time"] = pd.to_datetime(
-    df_uber["Date/Time"], format="%m/%d/%Y %H:%M:%S"
-)
-df_uber["day"] = df_uber["Date/Time"].dt.day
-df_uber["weekday"] = df_uber["Date/Time"].dt.weekday
-df_uber["hour"] = df_uber["Date/Time"].dt.hour
-df_uber["month"] = df_uber["Date/Time"].dt.month
+# Uber dataset: every uber*.csv in this folder is streamed once into a
+# month-partitioned Parquet store (.cache/uber_months) with calendar and
+# borough columns; only the selected months are loaded.
+ingest_months(sorted(Path(".").glob("uber*.csv")), boroughs_path="nyc.geojson")
+uber_months = available_months()
+month_filter = st.sidebar.multiselect(
+    "Months:", uber_months, default=uber_months[-1:]
+) or uber_months[-1:]
+uber_version = store_version(months=month_filter)
+with instrument.timed("uber: load months") as step:
+    df_uber = loaders.load_uber_months(month_filter)  # shared, never modified in place
+    step.rows = len(df_uber)
+with instrument.timed("uber: cube and index"):
+    uber_cube = loaders.uber_cube(df_uber, uber_version)  # day x hour x weekday x base counts
+    uber_index = loaders.uber_time_index(df_uber, uber_version)  # rows are sorted by (day, hour)
 
 # Tips dataset
-df_tips = pd.read_csv("tips.csv")
+df_tips = loaders.load_csv("tips.csv")
 df_tips["day"] = df_tips["day"].astype("category")
 df_tips["time"] = df_tips["time"].astype("category")
+tips_version = loaders.file_key("tips.csv")
+tips_sketch = loaders.tips_sketch(df_tips, tips_version)  # per-group distribution summaries
 
-# Load GeoJSON file (with progress bar)
+# Load GeoJSON file (with progress bar): a copy simplified for the city-wide
+# map, prepared once in .cache/geometry (see common/nyc_geometry.py)
 with st.spinner("Loading GeoJSON..."):
-    @st.cache_data
-    def load_geojson(filepath):
-        """Loads a GeoJSON file from the specified path."""
-        with open(filepath, "r") as f:
-            return json.load(f)
-
-    nyc_geojson = load_geojson("nyc.geojson")
-
-# Load NYC boroughs shapefile or GeoJSON (with progress bar)
-with st.spinner("Loading NYC Boroughs..."):
-    nyc_boroughs = gpd.read_file("nyc.geojson")
+    nyc_geojson = loaders.load_json(display_path("nyc.geojson"))
 
 # --- Images ---
-uber_logo = Image.open("Uber.png")
-my_pic = Image.open("CV.jpg")
-efrei_logo = Image.open("efrei.png")
+uber_logo = loaders.load_image("Uber.png")
+my_pic = loaders.load_image("CV.jpg")
+efrei_logo = loaders.load_image("efrei.png")
 
 # --- Sidebar ---
 with st.sidebar:
@@ -95,6 +115,11 @@ with st.sidebar:
     st.image(efrei_logo, width=200)
     st.title("Data Explorer")
 
+    # Drop every cached file so edited sources are re-read immediately
+    if st.button("Reload data 🔄"):
+        loaders.clear_caches()
+        st.rerun()
+
     # About Section (using st.expander to collapse by default)
     with st.expander("About Samuel BIENVENU 👋"):
         st.image(my_pic, use_column_width=True)
@@ -137,87 +162,53 @@ with st.sidebar:
     )
 
 
-# --- Tabs ---
-tab_home, tab_uber, tab_tips, tab_advanced = st.tabs(
-    ["Home 🏠", "Uber Trip Analysis 🚕", "Tip Analysis 🍽️", "Advanced Visualizations ✨"]
-)
-
-# --- Home Page ---
-with tab_home:
-    st.title("Data Analysis Dashboard 📊")
+# --- Filter Panels ---
+# Each panel is a fragment: changing one of its filters reruns only that
+# panel, not the data loading or the other tabs. Data comes in as arguments.
 
-    # Centered Uber logo with better presentation
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        st_lottie(lottie_data, height=200, key="data")
-
-    st.markdown(
-        """
-        <div style="text-align: center; margin-bottom: 20px;">
-            <h2 style="color:#00A0E9;font-family:Arial;font-size: 20px; font-weight: bold"> Exploring Uber and Restaurant Tip Data</h2>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    st.markdown(
-        """
-    This interactive dashboard allows you to explore Uber ride and restaurant tip data in depth.  
-    Discover the visualizations and analyses below:
-    """
-    )
-
-    st.markdown(
-        """
-    **Key Features:**
-    * **Uber Trip Analysis:**
-        * Visualization of ride frequency by day, hour, day of the week, and Uber base.
-        * Interactive and animated map showing the evolution of Uber rides in New York by borough.
-    * **Tip Analysis:**
-        * Interactive visualizations of tips based on total bill, day of the week, gender, and smoking habit.
-        * Exploration of relationships between these variables using a pivot table.
-    """
-    )
-
-# --- Uber Trip Analysis Page ---
-with tab_uber:
-    st.title("Uber Trip Analysis 🚕")
-
-    # Add Lottie animation at the top of the page
-    col1, col2, col3 = st.columns([1, 2, 1])  # Create three columns for layout
-    with col2:  # Center the animation in the middle column
-        st_lottie(lottie_taxi, height=200, key="taxi") 
-
-    show_data_preview(df_uber, "Uber")
 
+@st.fragment
+@instrument.section("uber")
+def uber_panel(df_uber, uber_cube, uber_index, uber_version):
+    """Uber filters and the charts that depend on them."""
     # --- Filters ---
     col1, col2, col3 = st.columns(3)
     with col1:
-        day_filter = st.slider("Day of the Month:", 1, 30, (1, 30))
+        day_filter = st.slider("Day of the Month:", 1, 31, (1, 31), key="day_filter")
     with col2:
-        hour_filter = st.slider("Hour of the Day:", 0, 23, (0, 23))
+        hour_filter = st.slider("Hour of the Day:", 0, 23, (0, 23), key="hour_filter")
     with col3:
         base_filter = st.multiselect(
-            "Uber Base:", df_uber["Base"].unique(), default=df_uber["Base"].unique()
+            "Uber Base:", uber_cube.bases, default=uber_cube.bases, key="base_filter"
         )
 
     # --- Apply Filters ---
-    df_uber_filtered = df_uber[
-        (df_uber["day"] >= day_filter[0])
-        & (df_uber["day"] <= day_filter[1])
-        & (df_uber["hour"] >= hour_filter[0])
-        & (df_uber["hour"] <= hour_filter[1])
-        & (df_uber["Base"].isin(base_filter))
-    ]
+    with instrument.timed("uber: filter rows") as step:
+        df_uber_filtered = uber_index.filter(df_uber, day_filter, hour_filter, base_filter)
+        step.rows = len(df_uber_filtered)
+    # Count-only charts are answered from the cube instead of the rows
+    with instrument.timed("uber: select cube"):
+        uber_counts = uber_cube.select(day_filter, hour_filter, base_filter)
+
+    # Charts are built once per dataset version and filter state (see common/figure_cache.py)
+    chart_key = (uber_version, day_filter, hour_filter, tuple(base_filter))
 
     # --- Visualizations ---
     st.header("Uber Ride Visualizations")
 
     # --- Chart 1: Histogram of Rides per Hour ---
-    fig_hour = px.histogram(
-        df_uber_filtered, x="hour", title="Number of Rides per Hour"
+    rides_per_hour = uber_counts.by_hour()
+    figure_cache.plotly_chart(
+        "uber: rides per hour",
+        chart_key,
+        lambda: px.bar(
+            x=rides_per_hour.index,
+            y=rides_per_hour.values,
+            labels={"x": "hour", "y": "count"},
+            title="Number of Rides per Hour",
+        ),
+        rows=len(rides_per_hour),
     )
-    st.plotly_chart(fig_hour)
     st.markdown(
         "**Insight:** This histogram reveals the peak hours for Uber rides, which can be valuable for demand forecasting and resource allocation."
     )
@@ -225,27 +216,48 @@ with tab_uber:
     # --- Chart 2: 3D Map of Dropoff Points ---
     st.subheader("3D Map of Dropoff Points")
     midpoint = (np.average(df_uber_filtered["Lat"]), np.average(df_uber_filtered["Lon"]))
-    st.pydeck_chart(
+    # Large selections are binned server-side; only small ones ship raw points
+    if len(df_uber_filtered) > RAW_POINT_LIMIT:
+        with instrument.timed("uber: hex bins") as step:
+            hex_data = add_column_style(
+                uber_map_bins(df_uber_filtered, uber_version, day_filter, hour_filter, base_filter, 11)
+            )
+            step.rows = len(df_uber_filtered)
+        hex_layer = pdk.Layer(
+            "ColumnLayer",
+            hex_data,
+            get_position=["lon", "lat"],
+            get_elevation="elevation",
+            get_fill_color="color",
+            radius=radius_for_zoom(11),
+            disk_resolution=6,
+            elevation_scale=4,
+            pickable=True,
+            extruded=True,
+        )
+    else:
+        hex_layer = pdk.Layer(
+            "HexagonLayer",
+            df_uber_filtered[["Lon", "Lat"]].rename(
+                columns={"Lon": "lon", "Lat": "lat"}
+            ),
+            get_position=["lon", "lat"],
+            radius=200,
+            elevation_scale=4,
+            elevation_range=[0, 1000],
+            pickable=True,
+            extruded=True,
+        )
+    instrument.pydeck_chart(
+        "uber: 3D map",
         pdk.Deck(
             map_style="mapbox://styles/mapbox/dark-v10",
             initial_view_state=pdk.ViewState(
                 latitude=midpoint[0], longitude=midpoint[1], zoom=11, pitch=50
             ),
-            layers=[
-                pdk.Layer(
-                    "HexagonLayer",
-                    df_uber_filtered[["Lon", "Lat"]].rename(
-                        columns={"Lon": "lon", "Lat": "lat"}
-                    ),
-                    get_position=["lon", "lat"],
-                    radius=200,
-                    elevation_scale=4,
-                    elevation_range=[0, 1000],
-                    pickable=True,
-                    extruded=True,
-                )
-            ],
-        )
+            layers=[hex_layer],
+        ),
+        rows=len(df_uber_filtered),
     )
     st.markdown(
         "**Insight:** The 3D hexbin map provides a visual representation of Uber dropoff hotspots, indicating areas with high ride demand."
@@ -253,35 +265,49 @@ with tab_uber:
 
     # Chart 3: Heatmap of Uber Rides
     st.subheader("Heatmap of Uber Rides")
-    fig_heatmap = px.density_mapbox(
-        df_uber_filtered,
-        lat="Lat",
-        lon="Lon",
-        radius=10,
-        center=dict(lat=40.7128, lon=-74.0060),
-        zoom=10,
-        mapbox_style="carto-positron",
-        title="Uber Ride Density",
-    )
-    st.plotly_chart(fig_heatmap)
+
+    def heatmap_chart():
+        if len(df_uber_filtered) > RAW_POINT_LIMIT:
+            heat_data = uber_map_bins(df_uber_filtered, uber_version, day_filter, hour_filter, base_filter, 10)
+            heat_weight = "count"
+        else:
+            heat_data = df_uber_filtered.rename(columns={"Lon": "lon", "Lat": "lat"})
+            heat_weight = None
+        return px.density_mapbox(
+            heat_data,
+            lat="lat",
+            lon="lon",
+            z=heat_weight,
+            radius=10,
+            center=dict(lat=40.7128, lon=-74.0060),
+            zoom=10,
+            mapbox_style="carto-positron",
+            title="Uber Ride Density",
+        )
+
+    figure_cache.plotly_chart("uber: heatmap", chart_key, heatmap_chart, rows=len(df_uber_filtered))
     st.markdown(
         "**Insight:** The heatmap confirms the areas with the highest concentration of Uber rides, offering a more granular view of ride density compared to the 3D map."
     )
 
     # Chart 4: Pie Chart of Uber Bases
     st.subheader("Proportion of Rides by Uber Base")
-    base_counts = df_uber_filtered["Base"].value_counts()
-    fig_pie = px.pie(
-        values=base_counts.values, names=base_counts.index, title="Proportion of Rides by Uber Base"
+    base_counts = uber_counts.by_base()
+    figure_cache.plotly_chart(
+        "uber: bases pie",
+        chart_key,
+        lambda: px.pie(
+            values=base_counts.values, names=base_counts.index, title="Proportion of Rides by Uber Base"
+        ),
+        rows=len(base_counts),
     )
-    st.plotly_chart(fig_pie)
     st.markdown(
         "**Insight:** The pie chart shows the market share of different Uber bases, highlighting which bases are most active during the selected period."
     )
 
     # Chart 5: Pivot Table of Rides by Day and Hour
     st.subheader("Number of Rides by Day and Hour")
-    df_pivot = df_uber_filtered.groupby(["weekday", "hour"]).size().unstack()
+    df_pivot = uber_counts.weekday_hour()
     st.dataframe(df_pivot)
     st.markdown(
         "**Insight:** The pivot table provides a detailed breakdown of ride frequency by day of the week and hour, revealing patterns in demand throughout the week."
@@ -289,123 +315,191 @@ with tab_uber:
 
     # Chart 6: Histogram of Rides by Day of the Week
     st.subheader("Number of Rides by Day of the Week")
-    fig_weekday = px.histogram(
-        df_uber_filtered,
-        x="weekday",
-        title="Number of Rides by Day of the Week",
-        nbins=7,
+    rides_per_weekday = uber_counts.by_weekday()
+    figure_cache.plotly_chart(
+        "uber: rides per weekday",
+        chart_key,
+        lambda: px.bar(
+            x=rides_per_weekday.index,
+            y=rides_per_weekday.values,
+            labels={"x": "weekday", "y": "count"},
+            title="Number of Rides by Day of the Week",
+        ),
+        rows=len(rides_per_weekday),
     )
-    st.plotly_chart(fig_weekday)
     st.markdown(
         "**Insight:** This histogram illustrates the variation in Uber ride demand across different days of the week, potentially indicating weekend vs. weekday trends."
     )
 
     # --- Download Options ---
-    csv = df_uber_filtered.to_csv(index=False)
-    st.download_button(
-        label="Download filtered Uber data as CSV",
-        data=csv,
-        file_name="uber_data.csv",
-        mime="text/csv",
-    )
+    # Serialised in chunks, and only when a button is clicked
+    download_buttons(df_uber_filtered, "Download filtered Uber data", "uber_data", key="uber_export")
 
-# --- Tip Analysis Page ---
-with tab_tips:
-    st.title("Tip Analysis 🍽️")
-    show_data_preview(df_tips, "Tips")
 
+@st.fragment
+@instrument.section("tips")
+def tips_panel(df_tips, tips_sketch, tips_version):
+    """Tips filters and the charts that depend on them."""
     # --- Filters ---
     col1, col2, col3 = st.columns(3)
     with col1:
         day_filter_tips = st.multiselect(
-            "Day of the Week:", df_tips["day"].unique(), default=df_tips["day"].unique()
+            "Day of the Week:", df_tips["day"].unique(), default=df_tips["day"].unique(), key="day_filter_tips"
         )
     with col2:
-        smoker_filter = st.radio("Smoker:", ["All", "Yes", "No"], index=0)
+        smoker_filter = st.radio("Smoker:", ["All", "Yes", "No"], index=0, key="smoker_filter")
     with col3:
-        gender_filter = st.radio("Gender:", ["All", "Male", "Female"], index=0)
+        gender_filter = st.radio("Gender:", ["All", "Male", "Female"], index=0, key="gender_filter")
 
     # --- Apply Filters ---
-    df_tips_filtered = df_tips[df_tips["day"].isin(day_filter_tips)]
-    if gender_filter != "All":
-        df_tips_filtered = df_tips_filtered[df_tips_filtered["sex"] == gender_filter]
-    if smoker_filter != "All":
-        df_tips_filtered = df_tips_filtered[df_tips_filtered["smoker"] == smoker_filter]
+    with instrument.timed("tips: filter rows") as step:
+        df_tips_filtered = df_tips[df_tips["day"].isin(day_filter_tips)]
+        if gender_filter != "All":
+            df_tips_filtered = df_tips_filtered[df_tips_filtered["sex"] == gender_filter]
+        if smoker_filter != "All":
+            df_tips_filtered = df_tips_filtered[df_tips_filtered["smoker"] == smoker_filter]
+        step.rows = len(df_tips_filtered)
+    n_tips = len(df_tips_filtered)
+    # Large selections: point layers get a stratified sample, distributions
+    # are summarised from every row (see common/tips_charts.py)
+    large = n_tips > LARGE_ROWS
+    # Distributions merge the precomputed group summaries instead of the rows
+    tips_summary = tips_sketch.select(
+        days=day_filter_tips,
+        sexes=None if gender_filter == "All" else [gender_filter],
+        smokers=None if smoker_filter == "All" else [smoker_filter],
+    )
+    if large:
+        with instrument.timed("tips: stratified sample") as step:
+            df_tips_points = stratified_sample(df_tips_filtered)
+            step.rows = n_tips
+        st.caption(
+            f"{n_tips:,} rows: points show a stratified sample of {len(df_tips_points):,}, "
+            "densities and boxes use every row."
+        )
+    else:
+        df_tips_points = df_tips_filtered
+    # Charts are built once per dataset version and filter state (see common/figure_cache.py)
+    chart_key = (tips_version, tuple(sorted(day_filter_tips)), smoker_filter, gender_filter)
 
     # --- Visualizations ---
     st.header("Tip Data Visualizations")
 
     # --- Chart 1: Scatter Plot for Total Bill vs. Tip ---
-    fig_scatter = px.scatter(
-        df_tips_filtered,
-        x="total_bill",
-        y="tip",
-        color="day",
-        size="size",
-        title="Total Bill vs. Tip Relationship",
-    )
-    st.plotly_chart(fig_scatter)
+    def scatter_chart():
+        if large:
+            return density_heatmap(df_tips_filtered, "total_bill", "tip", title="Total Bill vs. Tip Relationship")
+        return px.scatter(
+            df_tips_filtered,
+            x="total_bill",
+            y="tip",
+            color="day",
+            size="size",
+            title="Total Bill vs. Tip Relationship",
+        )
+
+    figure_cache.plotly_chart("tips: bill vs tip scatter", chart_key, scatter_chart, rows=n_tips)
     st.markdown(
         "**Insight:** This scatter plot explores the relationship between the total bill amount and the tip amount, revealing potential correlations and trends based on different days."
     )
 
     # --- Chart 2: Violin Plot ---
-    fig_violin = px.violin(
-        df_tips_filtered,
-        x="day",
-        y="tip",
-        color="sex",
-        box=True,
-        points="all",
-        title="Tip Distribution by Day and Gender",
-    )
-    st.plotly_chart(fig_violin)
+    def violin_chart():
+        if large:
+            return summary_violin(
+                tips_summary, "day", "sex", "tip", points=df_tips_points, title="Tip Distribution by Day and Gender"
+            )
+        return px.violin(
+            df_tips_filtered,
+            x="day",
+            y="tip",
+            color="sex",
+            box=True,
+            points="all",
+            title="Tip Distribution by Day and Gender",
+        )
+
+    figure_cache.plotly_chart("tips: violin", chart_key, violin_chart, rows=n_tips)
     st.markdown(
         "**Insight:** The violin plot provides insights into the distribution of tips by day and gender, showing the density and range of tips for each category."
     )
 
     # Chart 3: Boxplot of Tips by Day of the Week and Gender
     st.subheader("Tip Distribution by Day and Gender (Boxplot)")
-    fig_boxplot_tips, ax = plt.subplots(figsize=(10, 6))
-    sns.boxplot(x="day", y="tip", hue="sex", data=df_tips_filtered, ax=ax)
-    ax.set_xlabel("Day of the Week")
-    ax.set_ylabel("Tip")
-    ax.set_title("Tip Distribution by Day and Gender")
-    st.pyplot(fig_boxplot_tips)
+    # matplotlib figures are rendered to PNG once per key, then closed
+    def boxplot_by_day():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        if large:
+            summary_boxplot(ax, tips_summary, "day", "tip", hue="sex")
+        else:
+            sns.boxplot(x="day", y="tip", hue="sex", data=df_tips_filtered, ax=ax)
+        ax.set_xlabel("Day of the Week")
+        ax.set_ylabel("Tip")
+        ax.set_title("Tip Distribution by Day and Gender")
+        return fig
+
+    figure_cache.pyplot("tips: boxplot by day", chart_key, boxplot_by_day, rows=n_tips)
     st.markdown(
         "**Insight:** The boxplot offers a concise visualization of the tip distribution, highlighting the median, quartiles, and potential outliers for each day and gender combination."
     )
 
     # Chart 4: Histogram of Tips
     st.subheader("Tip Distribution (Histogram)")
-    fig_hist_tips = px.histogram(
-        df_tips_filtered, x="tip", nbins=20, title="Tip Distribution"
-    )
-    st.plotly_chart(fig_hist_tips)
+
+    def histogram_chart():
+        if large:
+            return summary_histogram(tips_summary, "tip", bins=20, title="Tip Distribution")
+        return px.histogram(
+            df_tips_filtered, x="tip", nbins=20, title="Tip Distribution"
+        )
+
+    figure_cache.plotly_chart("tips: histogram", chart_key, histogram_chart, rows=n_tips)
     st.markdown(
         "**Insight:** This histogram visualizes the overall distribution of tip amounts, showing the frequency of different tip ranges."
     )
 
     # Chart 5: Scatter Plot with Regression
     st.subheader("Relationship between Tip and Total Bill (Regression)")
-    fig_regplot, ax = plt.subplots(figsize=(10, 6))
-    sns.regplot(x="total_bill", y="tip", data=df_tips_filtered, ax=ax)
-    ax.set_xlabel("Total Bill Amount")
-    ax.set_ylabel("Tip")
-    ax.set_title("Relationship between Tip and Total Bill")
-    st.pyplot(fig_regplot)
+    # Off: line and 95% band come from the group sums, without refitting
+    bootstrap = st.toggle(
+        "Bootstrap the confidence band",
+        value=True,
+        disabled=large,
+        key="regplot_bootstrap",
+        help=f"seaborn resamples the rows 1000 times; always off above {LARGE_ROWS:,} rows.",
+    ) and not large
+
+    def regplot():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        if bootstrap:
+            sns.regplot(x="total_bill", y="tip", data=df_tips_filtered, ax=ax)
+        else:
+            summary_regplot(ax, tips_summary, df_tips_points)
+        ax.set_xlabel("Total Bill Amount")
+        ax.set_ylabel("Tip")
+        ax.set_title("Relationship between Tip and Total Bill")
+        return fig
+
+    figure_cache.pyplot("tips: regression", chart_key + (bootstrap,), regplot, rows=len(df_tips_points))
     st.markdown(
         "**Insight:** The scatter plot with regression line quantifies the relationship between the total bill and tip, indicating a positive correlation and allowing for predictions."
     )
 
     # Chart 6: Boxplot of Tips by Group Size
     st.subheader("Tip Distribution by Group Size (Boxplot)")
-    fig_boxplot_size, ax = plt.subplots(figsize=(10, 6))
-    sns.boxplot(x="size", y="tip", data=df_tips_filtered, ax=ax)
-    ax.set_xlabel("Group Size")
-    ax.set_ylabel("Tip")
-    ax.set_title("Tip Distribution by Group Size")
-    st.pyplot(fig_boxplot_size)
+
+    def boxplot_by_size():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        if large:
+            summary_boxplot(ax, tips_summary, "size", "tip")
+        else:
+            sns.boxplot(x="size", y="tip", data=df_tips_filtered, ax=ax)
+        ax.set_xlabel("Group Size")
+        ax.set_ylabel("Tip")
+        ax.set_title("Tip Distribution by Group Size")
+        return fig
+
+    figure_cache.pyplot("tips: boxplot by size", chart_key, boxplot_by_size, rows=n_tips)
     st.markdown(
         "**Insight:** The boxplot examines the impact of group size on tip amounts, revealing how tip distributions vary for different party sizes."
     )
@@ -434,128 +528,165 @@ with tab_tips:
     st.markdown(
         "**Insight:** The pivot table summarizes the average tip amounts based on day and gender, providing a concise overview of tipping patterns across different categories."
     )
-    
+
     # Chart 8: Histogram of Tip Percentage
     st.subheader("Distribution of Tip Percentage of Total")
     df_tips_filtered["tip_percentage"] = (
         df_tips_filtered["tip"] / df_tips_filtered["total_bill"]
     ) * 100
-    fig_hist_percentage, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(df_tips_filtered["tip_percentage"], kde=True, ax=ax)
-    ax.set_xlabel("Tip Percentage")
-    ax.set_ylabel("Frequency")
-    ax.set_title("Distribution of Tip Percentage")
-    st.pyplot(fig_hist_percentage)
+
+    def tip_percentage_histogram():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        if large:
+            summary_histplot(ax, tips_summary, "tip_percentage")
+        else:
+            sns.histplot(df_tips_filtered["tip_percentage"], kde=True, ax=ax)
+        ax.set_xlabel("Tip Percentage")
+        ax.set_ylabel("Frequency")
+        ax.set_title("Distribution of Tip Percentage")
+        return fig
+
+    figure_cache.pyplot("tips: tip percentage", chart_key, tip_percentage_histogram, rows=n_tips)
     st.markdown(
         "**Insight:** This histogram shows the distribution of tip percentages, revealing the most common tipping rates and identifying any outliers or unusual patterns."
     )
 
     # --- Download Options ---
-    csv = df_tips_filtered.to_csv(index=False)
-    st.download_button(
-        label="Download filtered tips data as CSV",
-        data=csv,
-        file_name="tips_data.csv",
-        mime="text/csv",
-    )
+    download_buttons(df_tips_filtered, "Download filtered tips data", "tips_data", key="tips_export")
 
 
-# --- Advanced Visualizations Page ---
-with tab_advanced:
-    st.title("Let's Dive into Stunning Visualizations! 🚀")
-
-    # --- Example 1: Interactive 3D Scatter Plot with Plotly ---
-    st.header("1. 3D Scatter Plot: Bill-Tip-Day Relationship")
-
-    fig = px.scatter_3d(
-        df_tips,
-        x="total_bill",
-        y="tip",
-        z="day",
-        color="sex",
-        size="size",
-        title="3D Relationship between Bill, Tip, and Day",
-        labels={"total_bill": "Total Bill", "tip": "Tip", "day": "Day", "sex": "Gender"},
-    )
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown(
-        "**Insight:** This interactive 3D scatter plot provides a multi-dimensional view of the data, allowing you to explore the relationship between bill amount, tip amount, day of the week, and gender simultaneously. You can rotate and zoom the plot to gain different perspectives."
-    )
+# --- Tabs ---
+# Only the selected tab runs; the filters of hidden tabs keep their values.
+TAB_LABELS = ["Home 🏠", "Uber Trip Analysis 🚕", "Tip Analysis 🍽️", "Advanced Visualizations ✨"]
+tab_home, tab_uber, tab_tips, tab_advanced = lazy_tabs(
+    TAB_LABELS,
+    key="tab",
+    keep={
+        TAB_LABELS[1]: ["day_filter", "hour_filter", "base_filter"],
+        TAB_LABELS[2]: ["day_filter_tips", "smoker_filter", "gender_filter", "regplot_bootstrap"],
+    },
+)
 
-    # --- Example 2: Animated Choropleth Map (New York) ---
-    st.header("2. Animated Choropleth Map: Evolution of Uber Rides in New York by Borough")
+# --- Home Page ---
+if tab_home.open:
+    with tab_home:
+        st.title("Data Analysis Dashboard 📊")
 
-    # Prepare data for the map
-    df_uber_geo = gpd.GeoDataFrame(
-        df_uber, geometry=gpd.points_from_xy(df_uber.Lon, df_uber.Lat), crs="EPSG:4326"
-    )
+        # Centered Uber logo with better presentation
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st_lottie(lottie_data, height=200, key="data")
 
-    # Spatial join (with progress bar)
-    with st.spinner("Performing spatial join..."):
-        df_joined = gpd.sjoin(df_uber_geo, nyc_boroughs, how="left", predicate="intersects")
-
-    # Group the data
-    df_joined["Date"] = pd.to_datetime(df_joined["Date/Time"]).dt.date
-    df_grouped = df_joined.groupby(["Date", "name"]).size().reset_index(name="Number of Rides")
-
-    # Create the choropleth map
-    fig_choro_ny = px.choropleth(
-        df_grouped,
-        geojson=nyc_geojson,
-        locations="name",  # Use 'name' as it's the name in the GeoJSON
-        featureidkey="properties.name",
-        color="Number of Rides",
-        animation_frame="Date",
-        color_continuous_scale="Viridis",
-        range_color=(0, df_grouped["Number of Rides"].max()),
-        title="Evolution of Uber Rides in New York by Borough",
-        hover_data=["Number of Rides"],
-        scope="north america",
-    )
+        st.markdown(
+            """
+            <div style="text-align: center; margin-bottom: 20px;">
+                <h2 style="color:#00A0E9;font-family:Arial;font-size: 20px; font-weight: bold"> Exploring Uber and Restaurant Tip Data</h2>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
 
-    # Improve appearance and projection
-    fig_choro_ny.update_geos(
-        center=dict(lon=-74.0060, lat=40.7128),
-        fitbounds="locations",
-        projection=dict(type="albers usa", parallels=[30, 40]),
-    )
-    fig_choro_ny.update_layout(
-        geo=dict(showland=True, landcolor="rgb(217, 217, 217)", countrycolor="white"),
-        margin={"r": 0, "t": 0, "l": 0, "b": 0},
-    )
+        st.markdown(
+            """
+        This interactive dashboard allows you to explore Uber ride and restaurant tip data in depth.  
+        Discover the visualizations and analyses below:
+        """
+        )
 
-    # Add a slider to select the date
-    unique_dates = df_grouped["Date"].unique()
-    fig_choro_ny.update_layout(
-        sliders=[
-            {
-                "steps": [
-                    {
-                        "args": [["Date", date]],
-                        "label": date.strftime("%Y-%m-%d"),
-                        "method": "animate",
-                    }
-                    for date in unique_dates
-                ]
-            }
-        ]
-    )
+        st.markdown(
+            """
+        **Key Features:**
+        * **Uber Trip Analysis:**
+            * Visualization of ride frequency by day, hour, day of the week, and Uber base.
+            * Interactive and animated map showing the evolution of Uber rides in New York by borough.
+        * **Tip Analysis:**
+            * Interactive visualizations of tips based on total bill, day of the week, gender, and smoking habit.
+            * Exploration of relationships between these variables using a pivot table.
+        """
+        )
 
-    st.plotly_chart(fig_choro_ny, use_container_width=True)
-    st.markdown(
-        "**Insight:** This animated choropleth map visually represents the evolution of Uber rides across different boroughs of New York City over time. Observe how ride patterns change throughout the month, providing valuable insights into spatial and temporal trends."
-    )
+# --- Uber Trip Analysis Page ---
+if tab_uber.open:
+    with tab_uber:
+        st.title("Uber Trip Analysis 🚕")
 
-    # --- Example 3: Interactive Sunburst Chart ---
-    st.header("3. Sunburst Chart: Tip Breakdown")
+        # Add Lottie animation at the top of the page
+        col1, col2, col3 = st.columns([1, 2, 1])  # Create three columns for layout
+        with col2:  # Center the animation in the middle column
+            st_lottie(lottie_taxi, height=200, key="taxi") 
 
-    fig_sunburst = px.sunburst(
-        df_tips,
-        path=["day", "sex", "time"],
-        values="tip",
-        title="Tip Breakdown by Day, Gender, and Time",
-    )
-    st.plotly_chart(fig_sunburst)
-    st.markdown(
-        "**Insight:** The sunburst chart provides a hierarchical breakdown of tip amounts based on day of the week, gender, and meal time. Explore the interactive segments to understand how these factors contribute to overall tip patterns. For example, you can see which combinations of day, gender, and time lead to the highest average tips."
-    )
\ No newline at end of file
+        show_data_preview(df_uber, "Uber")
+        with st.expander("Memory usage per column"):
+            st.dataframe(memory_report(df_uber))
+
+        uber_panel(df_uber, uber_cube, uber_index, uber_version)
+
+# --- Tip Analysis Page ---
+if tab_tips.open:
+    with tab_tips:
+        st.title("Tip Analysis 🍽️")
+        show_data_preview(df_tips, "Tips")
+
+        tips_panel(df_tips, tips_sketch, tips_version)
+
+# --- Advanced Visualizations Page ---
+if tab_advanced.open:
+    with tab_advanced:
+        st.title("Let's Dive into Stunning Visualizations! 🚀")
+
+        # --- Example 1: Interactive 3D Scatter Plot with Plotly ---
+        st.header("1. 3D Scatter Plot: Bill-Tip-Day Relationship")
+
+        figure_cache.plotly_chart(
+            "advanced: 3D scatter",
+            tips_version,
+            lambda: px.scatter_3d(
+                stratified_sample(df_tips) if len(df_tips) > LARGE_ROWS else df_tips,
+                x="total_bill",
+                y="tip",
+                z="day",
+                color="sex",
+                size="size",
+                title="3D Relationship between Bill, Tip, and Day",
+                labels={"total_bill": "Total Bill", "tip": "Tip", "day": "Day", "sex": "Gender"},
+            ),
+            rows=len(df_tips),
+            use_container_width=True,
+        )
+        st.markdown(
+            "**Insight:** This interactive 3D scatter plot provides a multi-dimensional view of the data, allowing you to explore the relationship between bill amount, tip amount, day of the week, and gender simultaneously. You can rotate and zoom the plot to gain different perspectives."
+        )
+
+        # --- Example 2: Animated Choropleth Map (New York) ---
+        st.header("2. Animated Choropleth Map: Evolution of Uber Rides in New York by Borough")
+
+        # Built once per dataset version: one trace holds the geometry, frames only the daily counts
+        with instrument.timed("advanced: borough animation"):
+            fig_choro_ny = borough_animation(df_uber, uber_version, nyc_geojson)
+
+        instrument.plotly_chart("advanced: choropleth", fig_choro_ny, rows=len(df_uber), use_container_width=True)
+        st.markdown(
+            "**Insight:** This animated choropleth map visually represents the evolution of Uber rides across different boroughs of New York City over time. Observe how ride patterns change throughout the month, providing valuable insights into spatial and temporal trends."
+        )
+
+        # --- Example 3: Interactive Sunburst Chart ---
+        st.header("3. Sunburst Chart: Tip Breakdown")
+
+        # Summed up front: px.sunburst's own aggregation is slow on large frames
+        figure_cache.plotly_chart(
+            "advanced: sunburst",
+            tips_version,
+            lambda: px.sunburst(
+                df_tips.groupby(["day", "sex", "time"], observed=True, as_index=False)["tip"].sum(),
+                path=["day", "sex", "time"],
+                values="tip",
+                title="Tip Breakdown by Day, Gender, and Time",
+            ),
+            rows=len(df_tips),
+        )
+        st.markdown(
+            "**Insight:** The sunburst chart provides a hierarchical breakdown of tip amounts based on day of the week, gender, and meal time. Explore the interactive segments to understand how these factors contribute to overall tip patterns. For example, you can see which combinations of day, gender, and time lead to the highest average tips."
+        )
+
+# --- Profiling ---
+instrument.panel()